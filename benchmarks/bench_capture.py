@@ -0,0 +1,59 @@
+"""
+Benchmark for the screen capture backends: milliseconds per full-screen grab
+as a PIL image and as a raw array, and per settle-sized region grab.
+
+Needs a display (e.g. `Xvfb :99 & DISPLAY=:99`); backends that can't start are skipped.
+
+    python3 benchmarks/bench_capture.py --iterations 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from operate.utils.capture import (  # noqa: E402
+    LegacyBackend,
+    MssBackend,
+    XlibBackend,
+)
+
+
+def measure(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{'backend':>8} {'call':>12} {'p50 ms':>8} {'p95 ms':>8}")
+    for backend_class in (LegacyBackend, XlibBackend, MssBackend):
+        try:
+            backend = backend_class()
+        except Exception as e:
+            print(f"{backend_class.name:>8} unavailable: {e}")
+            continue
+        calls = {
+            "grab": backend.grab,
+            "grab_array": backend.grab_array,
+            "region": lambda: backend.grab((0, 0, 320, 240)),
+        }
+        for call, func in calls.items():
+            func()  # warm up
+            p50, p95 = measure(func, args.iterations)
+            print(f"{backend.name:>8} {call:>12} {p50:>8.2f} {p95:>8.2f}")
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Offline end-to-end benchmark: runs `operate` on scripted scenarios against a
+local OpenAI-compatible stub server and a fixture screen, and reports per-turn
+and per-stage latency (capture, encode, model, ocr, actuation, settle).
+
+No network access or API key is needed. Screens come from a rendered fixture
+image (`OPERATE_FRAME_SOURCE`), and actuation runs on a private Xvfb display
+unless `DISPLAY` is already set. Needs the regular `operate` requirements.
+
+    python3 benchmarks/bench_e2e.py --repeat 3 --output results.json
+    python3 benchmarks/bench_e2e.py --baseline results.json --tolerance 0.2
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stub_openai_server import BYTES_PER_TOKEN, StubOpenAIServer  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios")
+STAGES = ["capture", "encode", "model", "ocr", "label", "actuation", "settle", "other"]
+
+# Regressions smaller than this many seconds are treated as noise
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def load_font(size):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            return ImageFont.load_default()
+
+
+def render_fixture(fixture, file_path):
+    """
+    Draws the scenario's fixture screen: dark text on a light background, large
+    enough for OCR to read reliably.
+    """
+    image = Image.new("RGB", tuple(fixture.get("size", [1280, 800])), "#f4f4f4")
+    draw = ImageDraw.Draw(image)
+    font = load_font(fixture.get("font_size", 36))
+    for item in fixture.get("texts", []):
+        draw.text((item["x"], item["y"]), item["text"], fill="#101010", font=font)
+    image.save(file_path)
+
+
+def start_display(display):
+    xvfb = subprocess.Popen(
+        ["Xvfb", display, "-screen", "0", "1280x800x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    time.sleep(1)
+    return xvfb
+
+
+def read_timings(file_path):
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def run_scenario(scenario, display, timeout, extra_args):
+    """
+    Runs one session of `scenario` in a fresh working directory.
+
+    Returns:
+        dict: The session's wall time, per-turn timings and stub request log.
+    """
+    workdir = tempfile.mkdtemp(prefix=f"operate-bench-{scenario['name']}-")
+    try:
+        fixture_path = os.path.join(workdir, "screen.png")
+        timings_path = os.path.join(workdir, "timings.jsonl")
+        render_fixture(scenario.get("fixture", {}), fixture_path)
+
+        with StubOpenAIServer(
+            scenario["responses"],
+            scenario.get("latency", 0.0),
+            chunk_interval=scenario.get("chunk_interval", 0.0),
+        ) as server:
+            env = dict(os.environ)
+            env.update(
+                {
+                    "OPENAI_API_BASE_URL": server.base_url,
+                    "OPENAI_API_KEY": "sk-stub",
+                    "OPERATE_FRAME_SOURCE": fixture_path,
+                    "DISPLAY": display,
+                    "PYTHONPATH": os.pathsep.join(
+                        [ROOT] + [p for p in [env.get("PYTHONPATH")] if p]
+                    ),
+                }
+            )
+            command = [
+                sys.executable,
+                "-c",
+                "from operate.main import main_entry; main_entry()",
+                "-m",
+                scenario["model"],
+                "--prompt",
+                scenario["prompt"],
+                "--timings",
+                timings_path,
+            ] + list(scenario.get("args", [])) + extra_args
+            start = time.perf_counter()
+            process = subprocess.run(
+                command,
+                cwd=workdir,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=timeout,
+            )
+            wall = time.perf_counter() - start
+            requests = list(server.requests)
+
+        turns = read_timings(timings_path)
+        return {
+            "wall": wall,
+            "returncode": process.returncode,
+            "turns": turns,
+            "requests": requests,
+            "completed": any(
+                operation["operation"] == "done"
+                for turn in turns
+                for operation in turn["operations"]
+            ),
+            "output": process.stdout[-4000:],
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def summarize(runs):
+    """
+    Reduces repeated runs of one scenario to medians per stage and per turn.
+    """
+    stages = {}
+    for stage in STAGES:
+        values = [
+            sum(
+                turn["other"] if stage == "other" else turn["phases"].get(stage, 0.0)
+                for turn in run["turns"]
+            )
+            for run in runs
+        ]
+        stages[stage] = statistics.median(values) if values else 0.0
+    # time phases overlapped, e.g. actuation during a streamed reply; not a stage
+    overlaps = [sum(turn.get("overlap", 0.0) for turn in run["turns"]) for run in runs]
+    turn_totals = [turn["total"] for run in runs for turn in run["turns"]]
+    upload_bytes = [request["bytes"] for run in runs for request in run["requests"]]
+    prompt_tokens = sum(upload_bytes) // BYTES_PER_TOKEN
+    cached_tokens = sum(
+        request.get("cached_tokens", 0) for run in runs for request in run["requests"]
+    )
+    return {
+        "runs": len(runs),
+        "completed": sum(run["completed"] for run in runs),
+        "wall": statistics.median(run["wall"] for run in runs),
+        "turns": statistics.median(len(run["turns"]) for run in runs),
+        "turn_p50": statistics.median(turn_totals) if turn_totals else 0.0,
+        "turn_max": max(turn_totals) if turn_totals else 0.0,
+        "request_bytes": statistics.median(upload_bytes) if upload_bytes else 0,
+        "cached_fraction": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+        "stages": stages,
+        "overlap": statistics.median(overlaps) if overlaps else 0.0,
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Lists every scenario stage (and wall time) that got slower than the baseline
+    by more than `tolerance` (a fraction) and MIN_REGRESSION_SECONDS.
+    """
+    regressions = []
+    for name, summary in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        pairs = [("wall", summary["wall"], previous["wall"])] + [
+            (stage, summary["stages"][stage], previous["stages"].get(stage, 0.0))
+            for stage in STAGES
+        ]
+        for metric, value, reference in pairs:
+            if (
+                value - reference > MIN_REGRESSION_SECONDS
+                and value > reference * (1 + tolerance)
+            ):
+                regressions.append((name, metric, reference, value))
+    return regressions
+
+
+def print_report(results):
+    header = f"{'scenario':<22} {'ok':>5} {'wall':>7} {'turns':>5} {'turn p50':>9} {'cached':>7}"
+    header += "".join(f" {stage:>9}" for stage in STAGES) + f" {'overlap':>9}"
+    print(header)
+    for name, summary in results.items():
+        line = (
+            f"{name:<22} {summary['completed']:>2}/{summary['runs']:<2} "
+            f"{summary['wall']:>7.2f} {summary['turns']:>5.0f} {summary['turn_p50']:>9.3f} "
+            f"{summary.get('cached_fraction', 0.0):>7.1%}"
+        )
+        line += "".join(f" {summary['stages'][stage]:>9.3f}" for stage in STAGES)
+        line += f" {summary.get('overlap', 0.0):>9.3f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "scenarios",
+        nargs="*",
+        help="Scenario JSON files, defaults to every file in benchmarks/scenarios",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--display", default=":98")
+    parser.add_argument("--output", help="Write the summary to this JSON file")
+    parser.add_argument("--baseline", help="Summary JSON of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "operate_args",
+        nargs=argparse.REMAINDER,
+        help="Extra `operate` flags after `--`, e.g. -- --speculative-ocr",
+    )
+    args = parser.parse_args()
+    extra_args = [arg for arg in args.operate_args if arg != "--"]
+
+    paths = args.scenarios or sorted(glob.glob(os.path.join(SCENARIOS_DIR, "*.json")))
+    scenarios = []
+    for path in paths:
+        with open(path) as file:
+            scenarios.append(json.load(file))
+
+    xvfb = None
+    display = os.environ.get("DISPLAY")
+    if not display:
+        if not shutil.which("Xvfb"):
+            sys.exit("Xvfb is required for this benchmark when DISPLAY is not set")
+        display = args.display
+        xvfb = start_display(display)
+
+    results = {}
+    failed = False
+    try:
+        for scenario in scenarios:
+            runs = []
+            for index in range(args.repeat):
+                run = run_scenario(scenario, display, args.timeout, extra_args)
+                if not run["completed"]:
+                    failed = True
+                    print(
+                        f"[bench_e2e] {scenario['name']} run {index} did not complete:\n{run['output']}"
+                    )
+                runs.append(run)
+            results[scenario["name"]] = summarize(runs)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for name, metric, reference, value in regressions:
+            print(
+                f"[bench_e2e] regression: {name} {metric} {reference:.3f}s -> {value:.3f}s"
+            )
+        if regressions:
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
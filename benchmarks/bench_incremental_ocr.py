@@ -0,0 +1,94 @@
+"""
+Benchmark for incremental OCR on a typing-heavy task: a text editor screen
+where each step types a few more characters into one line. Compares a full
+EasyOCR pass per step with `IncrementalOCR`, which only re-reads the tiles
+that changed, and checks both find the same words.
+
+Needs easyocr (and downloads its weights on first use).
+
+    python3 benchmarks/bench_incremental_ocr.py --steps 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from operate.utils.incremental_ocr import IncrementalOCR  # noqa: E402
+from operate.utils.ocr import get_ocr_reader  # noqa: E402
+from operate.utils.screenshot import Frame  # noqa: E402
+
+LINES = [
+    "File  Edit  View  Insert  Format  Tools  Help",
+    "Meeting notes",
+    "Attendees: Ana, Bo, Chen, Dara",
+    "Agenda: roadmap, hiring, budget review",
+    "Action items",
+]
+TYPED = "Send the quarterly report to finance by Friday"
+
+
+def load_font(size):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            return ImageFont.load_default()
+
+
+def render_step(typed, size=(1280, 800)):
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    font = load_font(24)
+    for index, line in enumerate(LINES):
+        draw.text((60, 40 + index * 60), line, fill="black", font=font)
+    draw.text((60, 40 + len(LINES) * 60), typed, fill="black", font=font)
+    return image
+
+
+def words(result):
+    return sorted(word for _, text, _ in result for word in text.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", type=int, default=15)
+    args = parser.parse_args()
+
+    reader = get_ocr_reader(["en"])
+    engine = IncrementalOCR()
+    engine.read(Frame(render_step("")), reader)  # the first frame is always a full pass
+
+    full_times, incremental_times, mismatches = [], [], 0
+    chars_per_step = max(1, len(TYPED) // args.steps)
+    for step in range(1, args.steps + 1):
+        frame = Frame(render_step(TYPED[: step * chars_per_step]))
+        frame.array  # convert once, outside both timings
+
+        start = time.perf_counter()
+        full = reader.readtext(frame.array)
+        full_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        incremental = engine.read(frame, reader)
+        incremental_times.append(time.perf_counter() - start)
+
+        if words(full) != words(incremental):
+            mismatches += 1
+
+    full_median = statistics.median(full_times) * 1000
+    incremental_median = statistics.median(incremental_times) * 1000
+    print(f"{'pass':>12} {'p50 ms':>9}")
+    print(f"{'full':>12} {full_median:>9.1f}")
+    print(f"{'incremental':>12} {incremental_median:>9.1f}")
+    print(f"speedup {full_median / incremental_median:.1f}x, {mismatches}/{args.steps} steps read different words")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark for the Set-of-Mark overlap suppression in `add_labels`.
+
+Compares the original pairwise `is_overlapping` loop with the vectorized
+`filter_overlapping_boxes` on random UI-sized boxes and checks they agree.
+
+    python3 benchmarks/bench_label_overlap.py
+"""
+import argparse
+import time
+
+import numpy as np
+
+from operate.utils.label import filter_overlapping_boxes, is_overlapping
+
+
+def legacy_filter(boxes):
+    drawn_boxes = []
+    keep = []
+    for box in boxes.tolist():
+        overlap = any(is_overlapping(box, drawn) for drawn in drawn_boxes)
+        if not overlap:
+            drawn_boxes.append(box)
+        keep.append(not overlap)
+    return np.array(keep, dtype=bool)
+
+
+def random_boxes(count, width=3840, height=2160, seed=0):
+    rng = np.random.default_rng(seed)
+    x1 = rng.uniform(0, width, count)
+    y1 = rng.uniform(0, height, count)
+    w = rng.uniform(10, 160, count)
+    h = rng.uniform(10, 40, count)
+    return np.stack([x1, y1, x1 + w, y1 + h], axis=1)
+
+
+def best_of(func, boxes, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(boxes)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'boxes':>6} {'legacy ms':>10} {'vectorized ms':>14} {'speedup':>8}")
+    for count in args.sizes:
+        boxes = random_boxes(count)
+        assert np.array_equal(legacy_filter(boxes), filter_overlapping_boxes(boxes))
+        legacy = best_of(legacy_filter, boxes, args.repeat)
+        vectorized = best_of(filter_overlapping_boxes, boxes, args.repeat)
+        print(
+            f"{count:>6} {legacy * 1000:>10.2f} {vectorized * 1000:>14.2f} {legacy / vectorized:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
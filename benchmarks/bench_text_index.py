@@ -0,0 +1,96 @@
+"""
+Benchmark for OCR click target lookup: the previous linear substring scan
+against `TextIndex` (build once, then ranked fuzzy lookups), on synthetic OCR
+results with thousands of text boxes.
+
+A frame only gets a click or two, so the cost that matters is per frame: the
+index build plus `--clicks` lookups, against `--clicks` linear scans. The
+build runs on the OCR worker right after the OCR pass; the lookups are on the
+critical path of each click.
+
+    python3 benchmarks/bench_text_index.py --boxes 1000 5000 --clicks 2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from operate.utils.text_index import TextIndex  # noqa: E402
+
+WORDS = (
+    "file edit view insert format tools help save open close search submit "
+    "cancel settings account profile sign in out next back home inbox sent "
+    "drafts compose reply forward delete archive report spam label filter"
+).split()
+
+
+def make_result(boxes, rng):
+    result = []
+    for index in range(boxes):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+        x, y = (index % 40) * 30, (index // 40) * 20
+        box = [[x, y], [x + 28, y], [x + 28, y + 18], [x, y + 18]]
+        result.append((box, text.title(), 0.9))
+    return result
+
+
+def legacy_lookup(result, search_text):
+    found_index = None
+    for index, element in enumerate(result):
+        if search_text in element[1]:
+            found_index = index
+    return found_index
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = func()
+    return (time.perf_counter() - start) / repeat * 1000, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--boxes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clicks", type=int, default=2, help="lookups per frame")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(
+        f"{'boxes':>6} {'legacy ms':>10} {'build ms':>9} {'lookup ms':>10} "
+        f"{'legacy/frame':>13} {'index/frame':>12} {'found':>11}"
+    )
+    for boxes in args.boxes:
+        result = make_result(boxes, rng)
+        queries = [rng.choice(result)[1] for _ in range(args.queries)]
+        # OCR misreads: drop a character from some queries
+        queries = [
+            query[:-1] if index % 3 == 0 and len(query) > 4 else query
+            for index, query in enumerate(queries)
+        ]
+
+        legacy_ms, _ = timed(
+            lambda: [legacy_lookup(result, query) for query in queries], 3
+        )
+        build_ms, index = timed(lambda: TextIndex(result), 3)
+        lookup_ms, matches = timed(
+            lambda: [index.best(query) for query in queries], 3
+        )
+        legacy_found = sum(legacy_lookup(result, query) is not None for query in queries)
+        found = sum(match is not None for match in matches)
+        legacy_ms /= len(queries)
+        lookup_ms /= len(queries)
+        print(
+            f"{boxes:>6} {legacy_ms:>10.4f} {build_ms:>9.2f} {lookup_ms:>10.4f} "
+            f"{legacy_ms * args.clicks:>13.3f} "
+            f"{build_ms + lookup_ms * args.clicks:>12.3f} "
+            f"{found:>5}/{legacy_found:<5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
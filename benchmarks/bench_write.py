@@ -0,0 +1,134 @@
+"""
+Benchmark for `OperatingSystem.write`: characters per second typed into a
+Tk text field on a private Xvfb display, for each text entry strategy.
+
+Needs Xvfb and python3-tk; the paste strategy also needs xclip or xsel.
+
+    python3 benchmarks/bench_write.py --length 200 1000
+"""
+import argparse
+import ast
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+TEXT_FIELD = r"""
+import sys
+import threading
+import tkinter
+
+root = tkinter.Tk()
+root.geometry("800x600+0+0")
+text = tkinter.Text(root)
+text.pack(fill="both", expand=True)
+text.focus_force()
+
+
+def dump():
+    content = text.get("1.0", "end-1c")
+    text.delete("1.0", "end")
+    sys.stdout.write(repr(content) + "\n")
+    sys.stdout.flush()
+
+
+def listen():
+    for line in sys.stdin:
+        if line.strip() == "dump":
+            root.after(0, dump)
+    root.after(0, root.destroy)
+
+
+def ready():
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+
+
+threading.Thread(target=listen, daemon=True).start()
+root.after(500, ready)
+root.mainloop()
+"""
+
+
+def start_display(display):
+    xvfb = subprocess.Popen(
+        ["Xvfb", display, "-screen", "0", "1280x800x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    time.sleep(1)
+    os.environ["DISPLAY"] = display
+    return xvfb
+
+
+def start_text_field():
+    field = subprocess.Popen(
+        [sys.executable, "-c", TEXT_FIELD],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert field.stdout.readline().strip() == "ready"
+    return field
+
+
+def read_field(field):
+    field.stdin.write("dump\n")
+    field.stdin.flush()
+    return ast.literal_eval(field.stdout.readline())
+
+
+def sample_text(length):
+    words = "the quick brown fox jumps over the lazy dog 0123456789 ".split(" ")
+    text = ""
+    while len(text) < length:
+        text += words[len(text) % len(words)] + " "
+    return text[:length]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--length", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--display", default=":97")
+    args = parser.parse_args()
+
+    if not shutil.which("Xvfb"):
+        sys.exit("Xvfb is required for this benchmark")
+
+    xvfb = start_display(args.display)
+    field = None
+    try:
+        # pyautogui connects to the display on import
+        from operate.config import Config
+        from operate.utils.operating_system import OperatingSystem
+
+        config = Config()
+        operating_system = OperatingSystem()
+        field = start_text_field()
+        strategies = ["type"]
+        if shutil.which("xclip") or shutil.which("xsel"):
+            strategies.append("paste")
+
+        print(f"{'strategy':>8} {'chars':>6} {'seconds':>8} {'chars/s':>9} {'ok':>3}")
+        for strategy in strategies:
+            config.write_strategy = strategy
+            for length in args.length:
+                text = sample_text(length)
+                start = time.perf_counter()
+                operating_system.write(text)
+                elapsed = time.perf_counter() - start
+                time.sleep(0.2)
+                ok = read_field(field) == text
+                print(
+                    f"{strategy:>8} {length:>6} {elapsed:>8.3f} {length / elapsed:>9.0f} {'yes' if ok else 'no':>3}"
+                )
+    finally:
+        if field is not None:
+            field.stdin.close()
+            field.wait(timeout=5)
+        xvfb.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+A local OpenAI-compatible chat completions server that replays scripted
+responses, so `operate` can run end to end without network access or an API key.
+
+Point `operate` at it with `OPENAI_API_BASE_URL=http://127.0.0.1:<port>/v1`.
+Each request to `/v1/chat/completions` gets the next scripted response; once
+the script is exhausted every request gets a `done` operation. Usage reports
+prompt caching the way OpenAI does it, approximately: the bytes a request
+shares with the start of the previous one count as cached, in 128 token steps
+once there are at least 1024. Requests with `"stream": true` get the reply as
+server-sent events, CHUNK_CHARACTERS at a time.
+
+    python3 benchmarks/stub_openai_server.py benchmarks/scenarios/ocr_click_and_type.json --port 8099
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Streamed replies are sent in chunks of this many characters
+CHUNK_CHARACTERS = 16
+
+# Rough request size, in bytes per token, and OpenAI's prompt caching granularity
+BYTES_PER_TOKEN = 4
+MIN_CACHED_TOKENS = 1024
+CACHED_TOKENS_STEP = 128
+
+EXHAUSTED_RESPONSE = [
+    {
+        "thought": "The scripted session is over",
+        "operation": "done",
+        "summary": "stub script exhausted",
+    }
+]
+
+
+class StubOpenAIServer:
+    """
+    Serves `responses` in order from a background thread.
+
+    Args:
+        responses (list): One entry per model request: a list of operations
+            (sent as JSON) or a raw string sent as is.
+        latency (float): Seconds each request is held before it is answered,
+            to simulate the model round-trip.
+        port (int): Port to listen on, 0 picks a free one.
+        chunk_interval (float): Seconds the model takes to generate each chunk
+            of CHUNK_CHARACTERS. Streamed replies send chunks at this pace,
+            others are sent once the whole reply is generated.
+    """
+
+    def __init__(self, responses, latency=0.0, port=0, chunk_interval=0.0):
+        self.responses = list(responses)
+        self.latency = latency
+        self.chunk_interval = chunk_interval
+        self.requests = []
+        self._previous_body = b""
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="stub-openai", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def get_cached_tokens(self, body):
+        """
+        Returns the prompt tokens of `body` the previous request would have cached.
+        """
+        with self._lock:
+            previous, self._previous_body = self._previous_body, body
+        length = min(len(previous), len(body))
+        shared = 0
+        # compare in chunks, the bodies hold megabytes of base64
+        step = 4096
+        while (
+            shared < length
+            and previous[shared : shared + step] == body[shared : shared + step]
+        ):
+            shared += step
+        while shared < length and previous[shared] == body[shared]:
+            shared += 1
+        shared = min(shared, length)
+        tokens = shared // BYTES_PER_TOKEN
+        if tokens < MIN_CACHED_TOKENS:
+            return 0
+        return tokens - tokens % CACHED_TOKENS_STEP
+
+    def next_content(self, request):
+        """
+        Returns the content of the next scripted response and records the request.
+        """
+        with self._lock:
+            index = len(self.requests)
+            self.requests.append(request)
+        response = (
+            self.responses[index] if index < len(self.responses) else EXHAUSTED_RESPONSE
+        )
+        return response if isinstance(response, str) else json.dumps(response)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                received = time.perf_counter()
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    self.send_error(400)
+                    return
+
+                cached_tokens = server.get_cached_tokens(body)
+                content = server.next_content(
+                    {
+                        "bytes": len(body),
+                        "cached_tokens": cached_tokens,
+                        "messages": len(payload.get("messages", [])),
+                        "model": payload.get("model"),
+                        "received": time.time(),
+                    }
+                )
+                if server.latency:
+                    time.sleep(server.latency)
+                chunks = [
+                    content[start : start + CHUNK_CHARACTERS]
+                    for start in range(0, len(content), CHUNK_CHARACTERS)
+                ]
+                usage = {
+                    "prompt_tokens": len(body) // BYTES_PER_TOKEN,
+                    "completion_tokens": 0,
+                    "total_tokens": len(body) // BYTES_PER_TOKEN,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                }
+                if payload.get("stream"):
+                    self.send_stream(payload, chunks, usage)
+                    return
+                if server.chunk_interval:
+                    time.sleep(server.chunk_interval * len(chunks))
+
+                data = json.dumps(
+                    {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": payload.get("model") or "stub",
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": content},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": usage,
+                    }
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header(
+                    "X-Stub-Processing-Ms",
+                    f"{(time.perf_counter() - received) * 1000:.1f}",
+                )
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_stream(self, payload, chunks, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                base = {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": payload.get("model") or "stub",
+                }
+                events = [
+                    dict(
+                        base,
+                        choices=[
+                            {"index": 0, "delta": {"content": chunk}, "finish_reason": None}
+                        ],
+                    )
+                    for chunk in chunks
+                ]
+                events.append(
+                    dict(
+                        base,
+                        choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    )
+                )
+                if (payload.get("stream_options") or {}).get("include_usage"):
+                    events.append(dict(base, choices=[], usage=usage))
+                for index, event in enumerate(events):
+                    if server.chunk_interval and index < len(chunks):
+                        time.sleep(server.chunk_interval)
+                    self.write_chunk(f"data: {json.dumps(event)}\n\n")
+                self.write_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def write_chunk(self, text):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("scenario", help="Scenario JSON file with a `responses` list")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=None)
+    parser.add_argument("--chunk-interval", type=float, default=None)
+    args = parser.parse_args()
+
+    with open(args.scenario) as file:
+        scenario = json.load(file)
+    latency = args.latency if args.latency is not None else scenario.get("latency", 0.0)
+    chunk_interval = (
+        args.chunk_interval
+        if args.chunk_interval is not None
+        else scenario.get("chunk_interval", 0.0)
+    )
+    server = StubOpenAIServer(
+        scenario["responses"], latency, args.port, chunk_interval
+    ).start()
+    print(f"Serving {len(server.responses)} scripted responses on {server.base_url}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,12 @@ import base64
 import json
 import openai
 import argparse
+import shutil
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from dotenv import load_dotenv
 
@@ -72,22 +78,19 @@ def format_evaluation_prompt(guideline):
 
 
 def parse_eval_content(content):
+    """Returns (guideline_met, reason) from the grader's response."""
     try:
         res = json.loads(content)
-
-        print(res["reason"])
-
-        return res["guideline_met"]
-    except:
-        print(
-            "The model gave a bad evaluation response and it couldn't be parsed. Exiting..."
+        return bool(res["guideline_met"]), res["reason"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(
+            "The model gave a bad evaluation response and it couldn't be parsed"
         )
-        exit(1)
 
 
-def evaluate_final_screenshot(guideline):
-    """Load the final screenshot and return True or False if it meets the given guideline."""
-    with open(SCREENSHOT_PATH, "rb") as img_file:
+def evaluate_final_screenshot(guideline, screenshot_path=SCREENSHOT_PATH):
+    """Load the final screenshot and return (guideline_met, reason) for the given guideline."""
+    with open(screenshot_path, "rb") as img_file:
         img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
 
         eval_message = [
@@ -116,24 +119,198 @@ def evaluate_final_screenshot(guideline):
         return parse_eval_content(eval_content)
 
 
-def run_test_case(objective, guideline, model):
-    """Returns True if the result of the test with the given prompt meets the given guideline for the given model."""
-    # Run `operate` with the model to evaluate and the test case prompt
-    subprocess.run(
-        ["operate", "-m", model, "--prompt", f'"{objective}"'],
+def start_virtual_display(display_command=None):
+    """
+    Starts a private Xvfb server on a free display number, and `display_command`
+    (e.g. a window manager and browser) inside it.
+
+    Returns:
+        tuple: The display name and the list of processes to stop afterwards.
+    """
+    read_fd, write_fd = os.pipe()
+    xvfb = subprocess.Popen(
+        [
+            "Xvfb",
+            "-displayfd",
+            str(write_fd),
+            "-screen",
+            "0",
+            "1280x800x24",
+            "-nolisten",
+            "tcp",
+        ],
+        pass_fds=(write_fd,),
         stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
     )
+    os.close(write_fd)
+    # Xvfb writes the display number it picked once it accepts connections
+    with os.fdopen(read_fd) as display_pipe:
+        display_number = display_pipe.readline().strip()
+    if not display_number:
+        xvfb.kill()
+        raise RuntimeError("Xvfb failed to start")
+    display = f":{display_number}"
+
+    processes = [xvfb]
+    if display_command:
+        processes.append(
+            subprocess.Popen(
+                display_command,
+                shell=True,
+                env=dict(os.environ, DISPLAY=display),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        )
+        time.sleep(2)
+    return display, processes
+
+
+def stop_processes(processes):
+    for process in reversed(processes):
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_test_case(
+    objective,
+    guideline,
+    model,
+    workdir=None,
+    display=None,
+    timeout=None,
+    grader_slots=None,
+):
+    """
+    Runs `operate` on one objective and grades its final screenshot.
 
-    try:
-        result = evaluate_final_screenshot(guideline)
-    except OSError:
-        print("[Error] Couldn't open the screenshot for evaluation")
-        return False
+    Each case runs in its own working directory (and display, when given), so
+    concurrent cases never share a screenshot. `grader_slots` bounds how many
+    cases are graded at the same time.
+
+    Returns:
+        dict: The case result, with "passed", "reason", "error" and durations in seconds.
+    """
+    workdir = workdir or os.getcwd()
+    env = dict(os.environ)
+    if display:
+        env["DISPLAY"] = display
+    result = {
+        "objective": objective,
+        "guideline": guideline,
+        "passed": False,
+        "reason": None,
+        "error": None,
+        "display": display,
+        "workdir": workdir,
+    }
 
+    # Run `operate` with the model to evaluate and the test case prompt
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(
+            ["operate", "-m", model, "--save-screenshots", "--prompt", f'"{objective}"'],
+            cwd=workdir,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            timeout=timeout,
+        )
+        result["returncode"] = process.returncode
+    except subprocess.TimeoutExpired:
+        result["error"] = f"operate timed out after {timeout}s"
+    result["run_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if result["error"] is None:
+        try:
+            with grader_slots or threading.Semaphore():
+                result["passed"], result["reason"] = evaluate_final_screenshot(
+                    guideline, os.path.join(workdir, SCREENSHOT_PATH)
+                )
+        except OSError:
+            result["error"] = "Couldn't open the screenshot for evaluation"
+        except Exception as e:
+            result["error"] = str(e)
+    result["grade_seconds"] = time.perf_counter() - start
+    result["duration"] = result["run_seconds"] + result["grade_seconds"]
     return result
 
 
-def get_test_model():
+def run_isolated_test_case(
+    index, objective, guideline, model, base_dir, timeout, grader_slots, display_command
+):
+    """
+    Runs one case in `base_dir/case-<index>` on its own virtual display.
+    """
+    workdir = os.path.join(base_dir, f"case-{index:03d}")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        display, processes = start_virtual_display(display_command)
+    except (OSError, RuntimeError) as e:
+        return {
+            "objective": objective,
+            "guideline": guideline,
+            "passed": False,
+            "reason": None,
+            "error": f"Couldn't start a virtual display: {e}",
+            "workdir": workdir,
+            "run_seconds": 0.0,
+            "grade_seconds": 0.0,
+            "duration": 0.0,
+        }
+    try:
+        return run_test_case(
+            objective, guideline, model, workdir, display, timeout, grader_slots
+        )
+    finally:
+        stop_processes(processes)
+
+
+def write_json_report(file_path, model, results, duration):
+    report = {
+        "model": model,
+        "duration": duration,
+        "passed": sum(result["passed"] for result in results),
+        "failed": sum(not result["passed"] and not result["error"] for result in results),
+        "errors": sum(bool(result["error"]) for result in results),
+        "cases": results,
+    }
+    with open(file_path, "w") as file:
+        json.dump(report, file, indent=2)
+
+
+def write_junit_report(file_path, model, results, duration):
+    suite = ET.Element(
+        "testsuite",
+        name=f"evaluate[{model}]",
+        tests=str(len(results)),
+        failures=str(sum(not r["passed"] and not r["error"] for r in results)),
+        errors=str(sum(bool(r["error"]) for r in results)),
+        time=f"{duration:.3f}",
+    )
+    for result in results:
+        case = ET.SubElement(
+            suite,
+            "testcase",
+            classname=model,
+            name=result["objective"],
+            time=f"{result['duration']:.3f}",
+        )
+        if result["error"]:
+            ET.SubElement(case, "error", message=result["error"])
+        elif not result["passed"]:
+            ET.SubElement(case, "failure", message=result["reason"] or "")
+        if result.get("reason"):
+            ET.SubElement(case, "system-out").text = result["reason"]
+    ET.ElementTree(suite).write(file_path, encoding="utf-8", xml_declaration=True)
+
+
+def get_test_args():
     parser = argparse.ArgumentParser(
         description="Run the self-operating-computer with a specified model."
     )
@@ -145,36 +322,128 @@ def get_test_model():
         required=False,
         default="gpt-4-with-ocr",
     )
+    parser.add_argument(
+        "--cases",
+        help="JSON file mapping objectives to guidelines, replaces the built-in test cases.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of cases run at the same time, each on its own Xvfb display.",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--isolate",
+        help="Run on private Xvfb displays even when --jobs is 1.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--display-command",
+        help="Shell command started in each virtual display before its case, e.g. a window manager and browser.",
+    )
+    parser.add_argument(
+        "--grader-concurrency",
+        help="Maximum number of screenshots graded at the same time.",
+        type=int,
+        default=4,
+    )
+    parser.add_argument(
+        "--timeout",
+        help="Seconds after which a case's `operate` run is stopped.",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--workdir",
+        help="Directory for the per-case working directories (default: a new temporary directory).",
+    )
+    parser.add_argument("--report-json", help="Write a JSON report to this file.")
+    parser.add_argument("--junit", help="Write a JUnit XML report to this file.")
 
-    return parser.parse_args().model
+    return parser.parse_args()
 
 
 def main():
     load_dotenv()
     openai.api_key = os.getenv("OPENAI_API_KEY")
 
-    model = get_test_model()
+    args = get_test_args()
+    model = args.model
+    test_cases = TEST_CASES
+    if args.cases:
+        with open(args.cases) as file:
+            test_cases = json.load(file)
 
     print(f"{ANSI_BLUE}[EVALUATING MODEL `{model}`]{ANSI_RESET}")
     print(f"{ANSI_BRIGHT_MAGENTA}[STARTING EVALUATION]{ANSI_RESET}")
 
-    passed = 0
-    failed = 0
-    for objective, guideline in TEST_CASES.items():
-        print(f"{ANSI_BLUE}[EVALUATING]{ANSI_RESET} '{objective}'")
-
-        result = run_test_case(objective, guideline, model)
-        if result:
-            print(f"{ANSI_GREEN}[PASSED]{ANSI_RESET} '{objective}'")
-            passed += 1
-        else:
-            print(f"{ANSI_RED}[FAILED]{ANSI_RESET} '{objective}'")
-            failed += 1
-
+    isolate = args.isolate or args.jobs > 1
+    if isolate and not shutil.which("Xvfb"):
+        sys.exit("Running cases in parallel or isolated needs Xvfb")
+    grader_slots = threading.BoundedSemaphore(max(1, args.grader_concurrency))
+
+    start = time.perf_counter()
+    results = []
+    if isolate:
+        base_dir = args.workdir or tempfile.mkdtemp(prefix="operate-evaluate-")
+        print(f"{ANSI_BLUE}[WORKDIR]{ANSI_RESET} {base_dir}")
+        # each case spends its time in child processes, threads are enough to drive them
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            futures = [
+                executor.submit(
+                    run_isolated_test_case,
+                    index,
+                    objective,
+                    guideline,
+                    model,
+                    base_dir,
+                    args.timeout,
+                    grader_slots,
+                    args.display_command,
+                )
+                for index, (objective, guideline) in enumerate(test_cases.items())
+            ]
+            print(f"{ANSI_BLUE}[EVALUATING]{ANSI_RESET} {len(futures)} cases, {args.jobs} at a time")
+            for future in as_completed(futures):
+                result = future.result()
+                print_result(result)
+                results.append(result)
+        order = list(test_cases)
+        results.sort(key=lambda result: order.index(result["objective"]))
+    else:
+        for objective, guideline in test_cases.items():
+            print(f"{ANSI_BLUE}[EVALUATING]{ANSI_RESET} '{objective}'")
+            result = run_test_case(
+                objective, guideline, model, args.workdir, None, args.timeout, grader_slots
+            )
+            print_result(result)
+            results.append(result)
+    duration = time.perf_counter() - start
+
+    if args.report_json:
+        write_json_report(args.report_json, model, results, duration)
+    if args.junit:
+        write_junit_report(args.junit, model, results, duration)
+
+    passed = sum(result["passed"] for result in results)
+    failed = len(results) - passed
     print(
-        f"{ANSI_BRIGHT_MAGENTA}[EVALUATION COMPLETE]{ANSI_RESET} {passed} test{'' if passed == 1 else 's'} passed, {failed} test{'' if failed == 1 else 's'} failed"
+        f"{ANSI_BRIGHT_MAGENTA}[EVALUATION COMPLETE]{ANSI_RESET} {passed} test{'' if passed == 1 else 's'} passed, {failed} test{'' if failed == 1 else 's'} failed in {duration:.1f}s"
     )
 
 
+def print_result(result):
+    objective = result["objective"]
+    if result["reason"]:
+        print(result["reason"])
+    if result["passed"]:
+        print(f"{ANSI_GREEN}[PASSED]{ANSI_RESET} '{objective}' ({result['duration']:.1f}s)")
+    elif result["error"]:
+        print(f"{ANSI_RED}[ERROR]{ANSI_RESET} '{objective}': {result['error']}")
+    else:
+        print(f"{ANSI_RED}[FAILED]{ANSI_RESET} '{objective}' ({result['duration']:.1f}s)")
+
+
 if __name__ == "__main__":
     main()
@@ -1,23 +1,56 @@
+import asyncio
+import importlib.util
 import os
 import sys
+import threading
 
 import google.generativeai as genai
+import httpx
 from dotenv import load_dotenv
 from ollama import Client
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import anthropic
 from prompt_toolkit.shortcuts import input_dialog
 
 
+# (minimum, maximum) seconds to wait for the screen to stop changing after each
+# operation type. The minimum gives the OS time to start reacting at all.
+DEFAULT_SETTLE_TIMINGS = {
+    "click": (0.1, 2.0),
+    "write": (0.05, 1.0),
+    "press": (0.1, 2.0),
+    "default": (0.1, 2.0),
+}
+
+
 class Config:
     """
     Configuration class for managing settings.
 
     Attributes:
         verbose (bool): Flag indicating whether verbose mode is enabled.
+        speculative_ocr (bool): Flag indicating whether OCR starts while the model request is in flight.
+        incremental_ocr (bool): Flag indicating whether OCR only re-reads the parts of the screen that changed.
+        save_screenshots (bool): Flag indicating whether captured screenshots and labeled images are written to disk.
+        image_format (str): Overrides the per-model upload format (PNG, JPEG or WEBP) when set.
+        image_quality (int): Overrides the per-model quality of lossy upload formats when set.
+        settle_timings (dict): (minimum, maximum) seconds to wait for the screen to settle, per operation type.
+        write_strategy (str): How `write` enters text: "type", "paste" or "auto" (per platform and length).
+        write_interval (float): Seconds between keystrokes when typing.
+        paste_threshold (int): Minimum length of content pasted in "auto" mode.
+        demo_mouse (bool): Flag indicating whether clicks animate the cursor before clicking.
+        timings_file (str): Path each turn's latency breakdown is appended to as a JSON line, if set.
+        trace_file (str): Path the session's Chrome trace is written to at exit, if set.
+        context_full_frames (int): Number of the newest screenshots sent at full resolution.
+        context_thumbnail_frames (int): Number of older screenshots sent as thumbnails, older ones are removed.
+        context_token_budget (int): Estimated input tokens a request may use, None for no limit.
+        stream (bool): Flag indicating whether model replies are streamed and their operations executed as they arrive.
+        capture_backend (str): Screen capture backend: "auto", "mss", "xlib" or "legacy".
+        frame_source (str): Image file returned instead of a real screen capture, if set (`OPERATE_FRAME_SOURCE`).
         openai_api_key (str): API key for OpenAI.
         google_api_key (str): API key for Google.
         ollama_host (str): url to ollama running remotely.
+        http2 (bool): Flag indicating whether API clients negotiate HTTP/2 (needs the `h2` package).
     """
 
     _instance = None
@@ -31,6 +64,25 @@ class Config:
     def __init__(self):
         load_dotenv()
         self.verbose = False
+        self.speculative_ocr = False
+        self.incremental_ocr = False
+        self.save_screenshots = False
+        self.image_format = None
+        self.image_quality = None
+        self.settle_timings = dict(DEFAULT_SETTLE_TIMINGS)
+        self.write_strategy = "auto"
+        self.write_interval = 0.0
+        self.paste_threshold = 40
+        self.demo_mouse = False
+        self.timings_file = None
+        self.trace_file = None
+        self.capture_backend = "auto"
+        self.stream = False
+        self.context_full_frames = 2
+        self.context_thumbnail_frames = 2
+        self.context_token_budget = 60000
+        # fixture screens for offline benchmarks and tests
+        self.frame_source = os.getenv("OPERATE_FRAME_SOURCE") or None
         self.openai_api_key = (
             None  # instance variables are backups in case saving to a `.env` fails
         )
@@ -46,9 +98,53 @@ class Config:
         self.qwen_api_key = (
             None  # instance variables are backups in case saving to a `.env` fails
         )
-       
+        self.http2 = importlib.util.find_spec("h2") is not None
+        # API clients are reused across turns so only the first request of a
+        # session pays for DNS, TCP and TLS setup. Keyed by provider, base url and key.
+        # `Config()` re-runs `__init__` on the shared instance, keep the pool alive
+        if not hasattr(self, "_clients"):
+            self._clients = {}
+            self._clients_lock = threading.Lock()
+
+    def get_client(self, key, factory):
+        """
+        Returns the client cached under `key`, creating it with `factory()` on first use.
+        """
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._clients_lock:
+            client = self._clients.get(key)
+            if client is None:
+                if self.verbose:
+                    print("[Config][get_client] creating client for", key[:2])
+                client = factory()
+                self._clients[key] = client
+        return client
+
+    @staticmethod
+    def get_client_key(provider, base_url, api_key, asynchronous):
+        """
+        Async clients own an `httpx.AsyncClient`, whose connections belong to the
+        running event loop, so they are cached per loop as well.
+        """
+        if asynchronous:
+            return (provider, base_url, api_key, asyncio.get_running_loop())
+        return (provider, base_url, api_key)
 
-    def initialize_openai(self):
+    def create_http_client(self, asynchronous=False):
+        """
+        Creates the keep-alive connection pool shared by all requests of one API client.
+        """
+        client_class = httpx.AsyncClient if asynchronous else httpx.Client
+        return client_class(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=10, max_keepalive_connections=5, keepalive_expiry=300
+            ),
+        )
+
+    def initialize_openai(self, asynchronous=False):
         if self.verbose:
             print("[Config][initialize_openai]")
 
@@ -63,14 +159,18 @@ class Config:
                 )
             api_key = os.getenv("OPENAI_API_KEY")
 
-        client = OpenAI(
-            api_key=api_key,
+        base_url = os.getenv("OPENAI_API_BASE_URL") or None
+        client_class = AsyncOpenAI if asynchronous else OpenAI
+        return self.get_client(
+            self.get_client_key("openai", base_url, api_key, asynchronous),
+            lambda: client_class(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=self.create_http_client(asynchronous),
+            ),
         )
-        client.api_key = api_key
-        client.base_url = os.getenv("OPENAI_API_BASE_URL", client.base_url)
-        return client
 
-    def initialize_qwen(self):
+    def initialize_qwen(self, asynchronous=False):
         if self.verbose:
             print("[Config][initialize_qwen]")
 
@@ -85,13 +185,16 @@ class Config:
                 )
             api_key = os.getenv("QWEN_API_KEY")
 
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+        base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+        client_class = AsyncOpenAI if asynchronous else OpenAI
+        return self.get_client(
+            self.get_client_key("qwen", base_url, api_key, asynchronous),
+            lambda: client_class(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=self.create_http_client(asynchronous),
+            ),
         )
-        client.api_key = api_key
-        client.base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-        return client
 
     def initialize_google(self):
         if self.google_api_key:
@@ -104,10 +207,12 @@ class Config:
                     "[Config][initialize_google] no cached google_api_key, try to get from env."
                 )
             api_key = os.getenv("GOOGLE_API_KEY")
-        genai.configure(api_key=api_key, transport="rest")
-        model = genai.GenerativeModel("gemini-pro-vision")
 
-        return model
+        def create_model():
+            genai.configure(api_key=api_key, transport="rest")
+            return genai.GenerativeModel("gemini-pro-vision")
+
+        return self.get_client(("google", None, api_key), create_model)
 
     def initialize_ollama(self):
         if self.ollama_host:
@@ -119,15 +224,22 @@ class Config:
                     "[Config][initialize_ollama] no cached ollama host. Assuming ollama running locally."
                 )
             self.ollama_host = os.getenv("OLLAMA_HOST", None)
-        model = Client(host=self.ollama_host)
-        return model
+        return self.get_client(
+            ("ollama", self.ollama_host, None), lambda: Client(host=self.ollama_host)
+        )
 
-    def initialize_anthropic(self):
+    def initialize_anthropic(self, asynchronous=False):
         if self.anthropic_api_key:
             api_key = self.anthropic_api_key
         else:
             api_key = os.getenv("ANTHROPIC_API_KEY")
-        return anthropic.Anthropic(api_key=api_key)
+        client_class = anthropic.AsyncAnthropic if asynchronous else anthropic.Anthropic
+        return self.get_client(
+            self.get_client_key("anthropic", None, api_key, asynchronous),
+            lambda: client_class(
+                api_key=api_key, http_client=self.create_http_client(asynchronous)
+            ),
+        )
 
     def initialize_my_custom_model(self):
         """
@@ -12,4 +12,23 @@ class ModelNotRecognizedException(Exception):
         super().__init__(self.message)
 
     def __str__(self):
-        return f"{self.message} : {self.model} "
\ No newline at end of file
+        return f"{self.message} : {self.model} "
+
+class StreamInterruptedException(Exception):
+    """Exception raised when a streamed reply fails after some of its
+    operations were already started, so no fallback may run in its place.
+
+    Attributes:
+        model -- the model whose reply failed
+        started -- the number of operations that were started
+        message -- explanation of the error
+    """
+
+    def __init__(self, model, started, message="Reply failed after operations started"):
+        self.model = model
+        self.started = started
+        self.message = message
+        super().__init__(self.message)
+
+    def __str__(self):
+        return f"{self.message} : {self.model} ({self.started} started)"
@@ -4,6 +4,21 @@ Self-Operating Computer
 import argparse
 from operate.utils.style import ANSI_BRIGHT_MAGENTA
 from operate.operate import main
+from operate.utils.capture import CAPTURE_BACKENDS
+
+
+def parse_settle_timing(value):
+    """
+    Parses a `TYPE=MIN:MAX` settle timing into `(type, (min, max))`.
+    """
+    try:
+        operation_type, timing = value.split("=", 1)
+        minimum, maximum = (float(part) for part in timing.split(":", 1))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected TYPE=MIN:MAX, e.g. click=0.1:2, got {value!r}"
+        )
+    return operation_type.strip().lower(), (minimum, maximum)
 
 
 def main_entry():
@@ -32,6 +47,132 @@ def main_entry():
         action="store_true",
     )
     
+    # Add a flag to skip preloading local models at startup
+    parser.add_argument(
+        "--no-warm-up",
+        help="Don't preload the OCR and YOLO models in the background at startup",
+        action="store_true",
+    )
+
+    # Add a flag to overlap OCR with the model request
+    parser.add_argument(
+        "--speculative-ocr",
+        help="Start OCR on each screenshot while waiting for the model response",
+        action="store_true",
+    )
+
+    # Add a flag to keep screenshots on disk (always on in verbose mode)
+    parser.add_argument(
+        "--save-screenshots",
+        help="Write each captured screenshot to screenshots/ and Set-of-Mark images to labeled_images/",
+        action="store_true",
+    )
+
+    # Add options for how images are encoded before upload
+    parser.add_argument(
+        "--image-format",
+        help="Format used for images sent to the model (default: chosen per model)",
+        choices=["PNG", "JPEG", "WEBP"],
+        type=str.upper,
+        default=None,
+    )
+    parser.add_argument(
+        "--image-quality",
+        help="Quality (1-100) used for JPEG and WEBP images sent to the model (default: 85)",
+        type=int,
+        default=None,
+    )
+
+    # Add an option to tune how long to wait for the screen after each operation
+    parser.add_argument(
+        "--settle",
+        help="Min and max seconds to wait for the screen to settle after an operation "
+        "type, e.g. --settle click=0.1:2 --settle write=0:0.5 (types: click, write, press, default)",
+        action="append",
+        type=parse_settle_timing,
+        default=[],
+        metavar="TYPE=MIN:MAX",
+    )
+
+    # Add options for how `write` operations enter text
+    parser.add_argument(
+        "--write-strategy",
+        help="Type text with the keyboard, paste it through the clipboard, or pick per platform and length",
+        choices=["auto", "type", "paste"],
+        default="auto",
+    )
+    parser.add_argument(
+        "--write-interval",
+        help="Seconds between keystrokes when typing (default: 0)",
+        type=float,
+        default=0.0,
+    )
+
+    # Add a flag for the animated cursor used in demos
+    parser.add_argument(
+        "--demo-mouse",
+        help="Glide and circle the cursor before each click instead of clicking immediately",
+        action="store_true",
+    )
+
+    # Add a flag to export the latency breakdown of each turn
+    parser.add_argument(
+        "--timings",
+        help="Append the per-turn latency breakdown (model, OCR, actuation, settle, ...) to this file as JSON lines",
+        type=str,
+        default=None,
+    )
+
+    # Add a flag to profile the session
+    parser.add_argument(
+        "--trace",
+        help="Record spans for capture, encoding, model calls, OCR, YOLO and actuation, write them to this file as a Chrome trace and print p50/p95 latencies at exit",
+        type=str,
+        default=None,
+    )
+
+    # Add a flag for incremental OCR
+    parser.add_argument(
+        "--incremental-ocr",
+        help="Only re-run OCR on the parts of the screen that changed since the previous turn",
+        action="store_true",
+    )
+
+    # Add a flag for streaming model replies
+    parser.add_argument(
+        "--stream",
+        help="Stream model replies and start each operation as soon as it is complete (OCR models)",
+        action="store_true",
+    )
+
+    # Add flags to bound the conversation history sent with each request
+    parser.add_argument(
+        "--context-frames",
+        help="Number of the newest screenshots sent at full resolution",
+        type=int,
+        default=2,
+    )
+    parser.add_argument(
+        "--context-thumbnails",
+        help="Number of older screenshots sent as thumbnails, older ones are removed",
+        type=int,
+        default=2,
+    )
+    parser.add_argument(
+        "--context-budget",
+        help="Estimated input tokens per request, older screenshots and turns are removed to fit (0 for no limit)",
+        type=int,
+        default=60000,
+    )
+
+    # Add a flag to choose how the screen is captured
+    parser.add_argument(
+        "--capture-backend",
+        help="Screen capture backend, auto picks the fastest one available",
+        choices=CAPTURE_BACKENDS,
+        default="auto",
+    )
+
     # Allow for direct input of prompt
     parser.add_argument(
         "--prompt",
@@ -46,7 +187,24 @@ def main_entry():
             args.model,
             terminal_prompt=args.prompt,
             voice_mode=args.voice,
-            verbose_mode=args.verbose
+            verbose_mode=args.verbose,
+            warm_up=not args.no_warm_up,
+            speculative_ocr=args.speculative_ocr,
+            save_screenshots=args.save_screenshots,
+            image_format=args.image_format,
+            image_quality=args.image_quality,
+            settle_timings=dict(args.settle),
+            write_strategy=args.write_strategy,
+            write_interval=args.write_interval,
+            demo_mouse=args.demo_mouse,
+            timings_file=args.timings,
+            trace_file=args.trace,
+            capture_backend=args.capture_backend,
+            incremental_ocr=args.incremental_ocr,
+            context_full_frames=args.context_frames,
+            context_thumbnail_frames=args.context_thumbnails,
+            context_token_budget=args.context_budget or None,
+            stream=args.stream,
         )
     except KeyboardInterrupt:
         print(f"\n{ANSI_BRIGHT_MAGENTA}Exiting...")
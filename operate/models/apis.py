@@ -1,94 +1,141 @@
-import base64
-import io
 import json
 import os
-import time
 import traceback
 
-import easyocr
 import ollama
-import pkg_resources
-from PIL import Image
-from ultralytics import YOLO
 
 from operate.config import Config
-from operate.exceptions import ModelNotRecognizedException
+from operate.exceptions import ModelNotRecognizedException, StreamInterruptedException
+from operate.models.context import compact_context
+from operate.models.conversation import (
+    get_ollama_images,
+    image_part,
+    render_anthropic_request,
+    render_messages,
+    text_part,
+    user_message,
+)
 from operate.models.prompts import (
     get_system_prompt,
     get_user_first_message_prompt,
     get_user_prompt,
 )
+from operate.utils.json_stream import OperationStreamParser
 from operate.utils.label import (
     add_labels,
     get_click_position_in_percent,
     get_label_coordinates,
+    get_yolo_model,
+)
+from operate.utils.misc import run_blocking
+from operate.utils.ocr import (
+    get_ocr_result_async,
+    get_text_coordinates,
+    get_text_element,
+    submit_ocr,
+)
+from operate.utils.screenshot import (
+    Frame,
+    capture_frame,
+    get_upload_image,
+    prepare_upload_image,
 )
-from operate.utils.ocr import get_text_coordinates, get_text_element
-from operate.utils.screenshot import capture_screen_with_cursor, compress_screenshot
 from operate.utils.style import ANSI_BRIGHT_MAGENTA, ANSI_GREEN, ANSI_RED, ANSI_RESET
+from operate.utils.timing import current_turn, measure, timed
+from operate.utils.tracing import traced
 
 # Load configuration
 config = Config()
 
+# Models that ground their `click` operations with EasyOCR
+OCR_MODELS = (
+    "gpt-4-with-ocr",
+    "gpt-4.1-with-ocr",
+    "o1-with-ocr",
+    "o3",
+    "o4-mini",
+    "claude-3",
+    "qwen-vl",
+)
+
 
-async def get_next_action(model, messages, objective, session_id):
+@traced("model")
+async def get_next_action(model, messages, objective, session_id, on_operation=None):
+    """
+    Asks `model` for the next operations. With `config.stream`, the OCR models
+    also await `on_operation` with each operation as soon as it is streamed and
+    grounded, before the reply is complete.
+    """
     if config.verbose:
         print("[Self-Operating Computer][get_next_action]")
         print("[Self-Operating Computer][get_next_action] model", model)
+    # bound what earlier turns add to this request
+    compact_context(messages, model)
     if model == "gpt-4":
-        return call_gpt_4o(messages), None
+        return await call_gpt_4o(messages), None
     if model == "qwen-vl":
-        operation = await call_qwen_vl_with_ocr(messages, objective, model)
+        operation = await call_qwen_vl_with_ocr(
+            messages, objective, model, on_operation
+        )
         return operation, None
     if model == "gpt-4-with-som":
         operation = await call_gpt_4o_labeled(messages, objective, model)
         return operation, None
     if model == "gpt-4-with-ocr":
-        operation = await call_gpt_4o_with_ocr(messages, objective, model)
+        operation = await call_gpt_4o_with_ocr(
+            messages, objective, model, on_operation
+        )
         return operation, None
     if model == "gpt-4.1-with-ocr":
-        operation = await call_gpt_4_1_with_ocr(messages, objective, model)
+        operation = await call_gpt_4_1_with_ocr(
+            messages, objective, model, on_operation
+        )
         return operation, None
     if model == "o1-with-ocr":
-        operation = await call_o1_with_ocr(messages, objective, model)
+        operation = await call_o1_with_ocr(
+            messages, objective, model, on_operation
+        )
         return operation, None
     # Add alias for o3 to use the same O1 model
     if model == "o3":
-        operation = await call_o3_with_ocr(messages, objective, model)
+        operation = await call_o3_with_ocr(
+            messages, objective, model, on_operation
+        )
         return operation, None
     # Add O4-mini model support
     if model == "o4-mini":
-        operation = await call_o4_mini_with_ocr(messages, objective, model)
+        operation = await call_o4_mini_with_ocr(
+            messages, objective, model, on_operation
+        )
         return operation, None
     if model == "agent-1":
         return "coming soon"
     if model == "gemini-pro-vision":
-        return call_gemini_pro_vision(messages, objective), None
+        return await call_gemini_pro_vision(messages, objective), None
     if model == "llava":
-        operation = call_ollama_llava(messages)
+        operation = await call_ollama_llava(messages)
         return operation, None
     if model == "claude-3":
-        operation = await call_claude_3_with_ocr(messages, objective, model)
+        operation = await call_claude_3_with_ocr(
+            messages, objective, model, on_operation
+        )
         return operation, None
     raise ModelNotRecognizedException(model)
 
 
-def call_gpt_4o(messages):
+@traced("model")
+async def call_gpt_4o(messages):
     if config.verbose:
         print("[call_gpt_4_v]")
-    time.sleep(1)
-    client = config.initialize_openai()
+    client = config.initialize_openai(asynchronous=True)
     try:
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
+        frame = await run_blocking(capture_frame, screenshot_filename)
 
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        image = await run_blocking(get_upload_image, frame, "gpt-4")
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
@@ -101,24 +148,19 @@ def call_gpt_4o(messages):
                 user_prompt,
             )
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        vision_message = user_message(text_part(user_prompt), image_part(image))
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            presence_penalty=1,
-            frequency_penalty=1,
+        response = await timed(
+            "model",
+            client.chat.completions.create(
+                model="gpt-4o",
+                messages=render_messages(messages, "openai"),
+                presence_penalty=1,
+                frequency_penalty=1,
+            ),
         )
+        record_usage(response)
 
         content = response.choices[0].message.content
 
@@ -147,59 +189,54 @@ def call_gpt_4o(messages):
         )
         if config.verbose:
             traceback.print_exc()
-        return call_gpt_4o(messages)
+        return await call_gpt_4o(messages)
 
 
-async def call_qwen_vl_with_ocr(messages, objective, model):
+@traced("model")
+async def call_qwen_vl_with_ocr(messages, objective, model, on_operation=None):
     if config.verbose:
         print("[call_qwen_vl_with_ocr]")
 
     # Construct the path to the file within the package
+    grounded = []
     try:
-        time.sleep(1)
-        client = config.initialize_qwen()
+        client = config.initialize_qwen(asynchronous=True)
 
         confirm_system_prompt(messages, objective, model)
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         # Call the function to capture the screen with the cursor
-        raw_screenshot_filename = os.path.join(screenshots_dir, "raw_screenshot.png")
-        capture_screen_with_cursor(raw_screenshot_filename)
+        screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
+        frame = await run_blocking(capture_frame, screenshot_filename)
 
-        # Compress screenshot image to make size be smaller
-        screenshot_filename = os.path.join(screenshots_dir, "screenshot.jpeg")
-        compress_screenshot(raw_screenshot_filename, screenshot_filename)
+        if config.speculative_ocr:
+            # start reading the screenshot while the model request is in flight
+            await run_blocking(submit_ocr, frame)
 
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        # Compress screenshot image to make size be smaller
+        image = await run_blocking(get_upload_image, frame, model)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text",
-                 "text": f"{user_prompt}**REMEMBER** Only output json format, do not append any other text."},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        vision_message = user_message(
+            text_part(
+                f"{user_prompt}**REMEMBER** Only output json format, do not append any other text."
+            ),
+            image_part(image),
+        )
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        ground, grounded = make_grounder(frame, "call_qwen_vl_with_ocr", on_operation)
+        content = await create_chat_completion(
+            client,
+            ground,
             model="qwen2.5-vl-72b-instruct",
-            messages=messages,
+            messages=render_messages(messages, "openai"),
         )
 
-        content = response.choices[0].message.content
-
         content = clean_json(content)
 
         # used later for the messages
@@ -207,50 +244,9 @@ async def call_qwen_vl_with_ocr(messages, objective, model):
 
         content = json.loads(content)
 
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print(
-                        "[call_qwen_vl_with_ocr][click] text_to_click",
-                        text_to_click,
-                    )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
-
-                # add `coordinates`` to `content`
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
-
-                if config.verbose:
-                    print(
-                        "[call_qwen_vl_with_ocr][click] text_element_index",
-                        text_element_index,
-                    )
-                    print(
-                        "[call_qwen_vl_with_ocr][click] coordinates",
-                        coordinates,
-                    )
-                    print(
-                        "[call_qwen_vl_with_ocr][click] final operation",
-                        operation,
-                    )
-                processed_content.append(operation)
-
-            else:
-                processed_content.append(operation)
+        processed_content = await ground_operations(
+            content, frame, "call_qwen_vl_with_ocr", grounded
+        )
 
         # wait to append the assistant message so that if the `processed_content` step fails we don't append a message and mess up message history
         assistant_message = {"role": "assistant", "content": content_str}
@@ -259,15 +255,18 @@ async def call_qwen_vl_with_ocr(messages, objective, model):
         return processed_content
 
     except Exception as e:
+        if on_operation is not None and grounded:
+            end_interrupted_stream(messages, grounded, model, e)
         print(
             f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
         )
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
+        return await gpt_4_fallback(messages, objective, model)
 
-def call_gemini_pro_vision(messages, objective):
+@traced("model")
+async def call_gemini_pro_vision(messages, objective):
     """
     Get the next action for Self-Operating Computer using Gemini Pro Vision
     """
@@ -275,25 +274,22 @@ def call_gemini_pro_vision(messages, objective):
         print(
             "[Self Operating Computer][call_gemini_pro_vision]",
         )
-    # sleep for a second
-    time.sleep(1)
     try:
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
-        # sleep for a second
-        time.sleep(1)
+        frame = await run_blocking(capture_frame, screenshot_filename)
         prompt = get_system_prompt("gemini-pro-vision", objective)
 
         model = config.initialize_google()
         if config.verbose:
             print("[call_gemini_pro_vision] model", model)
 
-        response = model.generate_content([prompt, Image.open(screenshot_filename)])
+        image = await run_blocking(prepare_upload_image, frame, "gemini-pro-vision")
+        response = await timed(
+            "model", run_blocking(model.generate_content, [prompt, image])
+        )
 
         content = response.text[1:]
         if config.verbose:
@@ -316,54 +312,48 @@ def call_gemini_pro_vision(messages, objective):
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return call_gpt_4o(messages)
+        return await call_gpt_4o(messages)
 
 
-async def call_gpt_4o_with_ocr(messages, objective, model):
+@traced("model")
+async def call_gpt_4o_with_ocr(messages, objective, model, on_operation=None):
     if config.verbose:
         print("[call_gpt_4o_with_ocr]")
 
     # Construct the path to the file within the package
+    grounded = []
     try:
-        time.sleep(1)
-        client = config.initialize_openai()
+        client = config.initialize_openai(asynchronous=True)
 
         confirm_system_prompt(messages, objective, model)
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
+        frame = await run_blocking(capture_frame, screenshot_filename)
+
+        if config.speculative_ocr:
+            # start reading the screenshot while the model request is in flight
+            await run_blocking(submit_ocr, frame)
 
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        image = await run_blocking(get_upload_image, frame, model)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        vision_message = user_message(text_part(user_prompt), image_part(image))
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        ground, grounded = make_grounder(frame, "call_gpt_4o_with_ocr", on_operation)
+        content = await create_chat_completion(
+            client,
+            ground,
             model="gpt-4o",
-            messages=messages,
+            messages=render_messages(messages, "openai"),
         )
 
-        content = response.choices[0].message.content
-
         content = clean_json(content)
 
         # used later for the messages
@@ -371,50 +361,9 @@ async def call_gpt_4o_with_ocr(messages, objective, model):
 
         content = json.loads(content)
 
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print(
-                        "[call_gpt_4o_with_ocr][click] text_to_click",
-                        text_to_click,
-                    )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
-
-                # add `coordinates`` to `content`
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
-
-                if config.verbose:
-                    print(
-                        "[call_gpt_4o_with_ocr][click] text_element_index",
-                        text_element_index,
-                    )
-                    print(
-                        "[call_gpt_4o_with_ocr][click] coordinates",
-                        coordinates,
-                    )
-                    print(
-                        "[call_gpt_4o_with_ocr][click] final operation",
-                        operation,
-                    )
-                processed_content.append(operation)
-
-            else:
-                processed_content.append(operation)
+        processed_content = await ground_operations(
+            content, frame, "call_gpt_4o_with_ocr", grounded
+        )
 
         # wait to append the assistant message so that if the `processed_content` step fails we don't append a message and mess up message history
         assistant_message = {"role": "assistant", "content": content_str}
@@ -423,105 +372,63 @@ async def call_gpt_4o_with_ocr(messages, objective, model):
         return processed_content
 
     except Exception as e:
+        if on_operation is not None and grounded:
+            end_interrupted_stream(messages, grounded, model, e)
         print(
             f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
         )
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
+        return await gpt_4_fallback(messages, objective, model)
 
 
-async def call_gpt_4_1_with_ocr(messages, objective, model):
+@traced("model")
+async def call_gpt_4_1_with_ocr(messages, objective, model, on_operation=None):
     if config.verbose:
         print("[call_gpt_4_1_with_ocr]")
 
+    grounded = []
     try:
-        time.sleep(1)
-        client = config.initialize_openai()
+        client = config.initialize_openai(asynchronous=True)
 
         confirm_system_prompt(messages, objective, model)
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
+        frame = await run_blocking(capture_frame, screenshot_filename)
+
+        if config.speculative_ocr:
+            # start reading the screenshot while the model request is in flight
+            await run_blocking(submit_ocr, frame)
 
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        image = await run_blocking(get_upload_image, frame, model)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        vision_message = user_message(text_part(user_prompt), image_part(image))
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        ground, grounded = make_grounder(frame, "call_gpt_4_1_with_ocr", on_operation)
+        content = await create_chat_completion(
+            client,
+            ground,
             model="gpt-4.1",
-            messages=messages,
+            messages=render_messages(messages, "openai"),
         )
 
-        content = response.choices[0].message.content
-
         content = clean_json(content)
 
         content_str = content
 
         content = json.loads(content)
 
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print(
-                        "[call_gpt_4_1_with_ocr][click] text_to_click",
-                        text_to_click,
-                    )
-                reader = easyocr.Reader(["en"])
-
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
-
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
-
-                if config.verbose:
-                    print(
-                        "[call_gpt_4_1_with_ocr][click] text_element_index",
-                        text_element_index,
-                    )
-                    print(
-                        "[call_gpt_4_1_with_ocr][click] coordinates",
-                        coordinates,
-                    )
-                    print(
-                        "[call_gpt_4_1_with_ocr][click] final operation",
-                        operation,
-                    )
-                processed_content.append(operation)
-
-            else:
-                processed_content.append(operation)
+        processed_content = await ground_operations(
+            content, frame, "call_gpt_4_1_with_ocr", grounded
+        )
 
         assistant_message = {"role": "assistant", "content": content_str}
         messages.append(assistant_message)
@@ -529,60 +436,56 @@ async def call_gpt_4_1_with_ocr(messages, objective, model):
         return processed_content
 
     except Exception as e:
+        if on_operation is not None and grounded:
+            end_interrupted_stream(messages, grounded, model, e)
         print(
             f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
         )
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
+        return await gpt_4_fallback(messages, objective, model)
 
 
-async def call_o1_with_ocr(messages, objective, model):
+@traced("model")
+async def call_o1_with_ocr(messages, objective, model, on_operation=None):
     if config.verbose:
         print("[call_o1_with_ocr]")
 
     # Construct the path to the file within the package
+    grounded = []
     try:
-        time.sleep(1)
-        client = config.initialize_openai()
+        client = config.initialize_openai(asynchronous=True)
 
         confirm_system_prompt(messages, objective, model)
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
+        frame = await run_blocking(capture_frame, screenshot_filename)
+
+        if config.speculative_ocr:
+            # start reading the screenshot while the model request is in flight
+            await run_blocking(submit_ocr, frame)
 
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        image = await run_blocking(get_upload_image, frame, model)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        vision_message = user_message(text_part(user_prompt), image_part(image))
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        ground, grounded = make_grounder(frame, "call_o1_with_ocr", on_operation)
+        content = await create_chat_completion(
+            client,
+            ground,
             model="o1",
-            messages=messages,
+            messages=render_messages(messages, "openai"),
         )
 
-        content = response.choices[0].message.content
-
         content = clean_json(content)
 
         # used later for the messages
@@ -590,50 +493,9 @@ async def call_o1_with_ocr(messages, objective, model):
 
         content = json.loads(content)
 
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print(
-                        "[call_o1_with_ocr][click] text_to_click",
-                        text_to_click,
-                    )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
-
-                # add `coordinates`` to `content`
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
-
-                if config.verbose:
-                    print(
-                        "[call_o1_with_ocr][click] text_element_index",
-                        text_element_index,
-                    )
-                    print(
-                        "[call_o1_with_ocr][click] coordinates",
-                        coordinates,
-                    )
-                    print(
-                        "[call_o1_with_ocr][click] final operation",
-                        operation,
-                    )
-                processed_content.append(operation)
-
-            else:
-                processed_content.append(operation)
+        processed_content = await ground_operations(
+            content, frame, "call_o1_with_ocr", grounded
+        )
 
         # wait to append the assistant message so that if the `processed_content` step fails we don't append a message and mess up message history
         assistant_message = {"role": "assistant", "content": content_str}
@@ -642,36 +504,35 @@ async def call_o1_with_ocr(messages, objective, model):
         return processed_content
 
     except Exception as e:
+        if on_operation is not None and grounded:
+            end_interrupted_stream(messages, grounded, model, e)
         print(
             f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
         )
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return gpt_4_fallback(messages, objective, model)
+        return await gpt_4_fallback(messages, objective, model)
 
 
+@traced("model")
 async def call_gpt_4o_labeled(messages, objective, model):
-    time.sleep(1)
-
     try:
-        client = config.initialize_openai()
+        client = config.initialize_openai(asynchronous=True)
 
         confirm_system_prompt(messages, objective, model)
-        file_path = pkg_resources.resource_filename("operate.models.weights", "best.pt")
-        yolo_model = YOLO(file_path)  # Load your trained model
+        # Shared trained model, loaded once per process
+        yolo_model = await run_blocking(get_yolo_model)
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
+        frame = await run_blocking(capture_frame, screenshot_filename)
 
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
-
-        img_base64_labeled, label_coordinates = add_labels(img_base64, yolo_model)
+        image_labeled, label_coordinates = await run_blocking(
+            add_labels, frame.image, yolo_model
+        )
+        image = await run_blocking(get_upload_image, Frame(image_labeled), model)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
@@ -684,26 +545,19 @@ async def call_gpt_4o_labeled(messages, objective, model):
                 user_prompt,
             )
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{img_base64_labeled}"
-                    },
-                },
-            ],
-        }
+        vision_message = user_message(text_part(user_prompt), image_part(image))
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            presence_penalty=1,
-            frequency_penalty=1,
+        response = await timed(
+            "model",
+            client.chat.completions.create(
+                model="gpt-4o",
+                messages=render_messages(messages, "openai"),
+                presence_penalty=1,
+                frequency_penalty=1,
+            ),
         )
+        record_usage(response)
 
         content = response.choices[0].message.content
 
@@ -741,10 +595,7 @@ async def call_gpt_4o_labeled(messages, objective, model):
                         "[Self Operating Computer][call_gpt_4_vision_preview_labeled] coordinates",
                         coordinates,
                     )
-                image = Image.open(
-                    io.BytesIO(base64.b64decode(img_base64))
-                )  # Load the image to get its size
-                image_size = image.size  # Get the size of the image (width, height)
+                image_size = frame.size  # Get the size of the image (width, height)
                 click_position_percent = get_click_position_in_percent(
                     coordinates, image_size
                 )
@@ -757,7 +608,7 @@ async def call_gpt_4o_labeled(messages, objective, model):
                     print(
                         f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] Failed to get click position in percent. Trying another method {ANSI_RESET}"
                     )
-                    return call_gpt_4o(messages)
+                    return await call_gpt_4o(messages)
 
                 x_percent = f"{click_position_percent[0]:.2f}"
                 y_percent = f"{click_position_percent[1]:.2f}"
@@ -792,22 +643,20 @@ async def call_gpt_4o_labeled(messages, objective, model):
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-        return call_gpt_4o(messages)
+        return await call_gpt_4o(messages)
 
 
-def call_ollama_llava(messages):
+@traced("model")
+async def call_ollama_llava(messages):
     if config.verbose:
         print("[call_ollama_llava]")
-    time.sleep(1)
     try:
         model = config.initialize_ollama()
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
         # Call the function to capture the screen with the cursor
-        capture_screen_with_cursor(screenshot_filename)
+        frame = await run_blocking(capture_frame, screenshot_filename)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
@@ -820,22 +669,24 @@ def call_ollama_llava(messages):
                 user_prompt,
             )
 
-        vision_message = {
-            "role": "user",
-            "content": user_prompt,
-            "images": [screenshot_filename],
-        }
+        image = await run_blocking(get_upload_image, frame, "llava")
+        vision_message = user_message(text_part(user_prompt), image_part(image))
         messages.append(vision_message)
 
-        response = model.chat(
-            model="llava",
-            messages=messages,
-        )
-
-        # Important: Remove the image path from the message history.
+        # Important: Only send the image of the last message.
         # Ollama will attempt to load each image reference and will
         # eventually timeout.
-        messages[-1]["images"] = None
+        rendered = render_messages(messages, "ollama")
+        rendered[-1] = dict(rendered[-1], images=get_ollama_images(vision_message))
+
+        response = await timed(
+            "model",
+            run_blocking(
+                model.chat,
+                model="llava",
+                messages=rendered,
+            ),
+        )
 
         content = response["message"]["content"].strip()
 
@@ -870,106 +721,81 @@ def call_ollama_llava(messages):
         )
         if config.verbose:
             traceback.print_exc()
-        return call_ollama_llava(messages)
+        return await call_ollama_llava(messages)
 
 
-async def call_claude_3_with_ocr(messages, objective, model):
+@traced("model")
+async def call_claude_3_with_ocr(messages, objective, model, on_operation=None):
     if config.verbose:
         print("[call_claude_3_with_ocr]")
 
+    grounded = []
     try:
-        time.sleep(1)
-        client = config.initialize_anthropic()
+        client = config.initialize_anthropic(asynchronous=True)
 
         confirm_system_prompt(messages, objective, model)
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
-
-        # downsize screenshot due to 5MB size limit
-        with open(screenshot_filename, "rb") as img_file:
-            img = Image.open(img_file)
-
-            # Convert RGBA to RGB
-            if img.mode == "RGBA":
-                img = img.convert("RGB")
-
-            # Calculate the new dimensions while maintaining the aspect ratio
-            original_width, original_height = img.size
-            aspect_ratio = original_width / original_height
-            new_width = 2560  # Adjust this value to achieve the desired file size
-            new_height = int(new_width / aspect_ratio)
-            if config.verbose:
-                print("[call_claude_3_with_ocr] resizing claude")
-
-            # Resize the image
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        frame = await run_blocking(capture_frame, screenshot_filename)
 
-            # Save the resized and converted image to a BytesIO object for JPEG format
-            img_buffer = io.BytesIO()
-            img_resized.save(
-                img_buffer, format="JPEG", quality=85
-            )  # Adjust the quality parameter as needed
-            img_buffer.seek(0)
+        if config.speculative_ocr:
+            # start reading the screenshot while the model request is in flight
+            await run_blocking(submit_ocr, frame)
 
-            # Encode the resized image as base64
-            img_data = base64.b64encode(img_buffer.getvalue()).decode("utf-8")
+        # downsize screenshot due to 5MB size limit
+        image = await run_blocking(get_upload_image, frame, model)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {
-                    "type": "image",
-                    "source": {
-                        "type": "base64",
-                        "media_type": "image/jpeg",
-                        "data": img_data,
-                    },
-                },
-                {
-                    "type": "text",
-                    "text": user_prompt
-                    + "**REMEMBER** Only output json format, do not append any other text.",
-                },
-            ],
-        }
+        vision_message = user_message(
+            image_part(image),
+            text_part(
+                user_prompt
+                + "**REMEMBER** Only output json format, do not append any other text."
+            ),
+        )
         messages.append(vision_message)
 
         # anthropic api expect system prompt as an separate argument
-        response = client.messages.create(
+        system, rendered = render_anthropic_request(messages)
+        ground, grounded = make_grounder(frame, "call_claude_3_with_ocr", on_operation)
+        content = await create_message(
+            client,
+            ground,
             model="claude-3-opus-20240229",
             max_tokens=3000,
-            system=messages[0]["content"],
-            messages=messages[1:],
+            system=system,
+            messages=rendered,
         )
-
-        content = response.content[0].text
         content = clean_json(content)
         content_str = content
         try:
             content = json.loads(content)
         # rework for json mode output
         except json.JSONDecodeError as e:
+            if on_operation is not None and grounded:
+                # the started operations may not match a repaired reply
+                raise
             if config.verbose:
                 print(
                     f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] JSONDecodeError: {e} {ANSI_RESET}"
                 )
-            response = client.messages.create(
-                model="claude-3-opus-20240229",
-                max_tokens=3000,
-                system=f"This json string is not valid, when using with json.loads(content) \
-                it throws the following error: {e}, return correct json string. \
-                **REMEMBER** Only output json format, do not append any other text.",
-                messages=[{"role": "user", "content": content}],
+            response = await timed(
+                "model",
+                client.messages.create(
+                    model="claude-3-opus-20240229",
+                    max_tokens=3000,
+                    system=f"This json string is not valid, when using with json.loads(content) \
+                    it throws the following error: {e}, return correct json string. \
+                    **REMEMBER** Only output json format, do not append any other text.",
+                    messages=[{"role": "user", "content": content}],
+                ),
             )
+            record_usage(response)
             content = response.content[0].text
             content = clean_json(content)
             content_str = content
@@ -979,51 +805,9 @@ async def call_claude_3_with_ocr(messages, objective, model):
             print(
                 f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] content: {content} {ANSI_RESET}"
             )
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print(
-                        "[call_claude_3_ocr][click] text_to_click",
-                        text_to_click,
-                    )
-                # Initialize EasyOCR Reader
-                reader = easyocr.Reader(["en"])
-
-                # Read the screenshot
-                result = reader.readtext(screenshot_filename)
-
-                # limit the text to extract has a higher success rate
-                text_element_index = get_text_element(
-                    result, text_to_click[:3], screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
-
-                # add `coordinates`` to `content`
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
-
-                if config.verbose:
-                    print(
-                        "[call_claude_3_ocr][click] text_element_index",
-                        text_element_index,
-                    )
-                    print(
-                        "[call_claude_3_ocr][click] coordinates",
-                        coordinates,
-                    )
-                    print(
-                        "[call_claude_3_ocr][click] final operation",
-                        operation,
-                    )
-                processed_content.append(operation)
-
-            else:
-                processed_content.append(operation)
+        processed_content = await ground_operations(
+            content, frame, "call_claude_3_with_ocr", grounded
+        )
 
         assistant_message = {"role": "assistant", "content": content_str}
         messages.append(assistant_message)
@@ -1031,123 +815,67 @@ async def call_claude_3_with_ocr(messages, objective, model):
         return processed_content
 
     except Exception as e:
+        if on_operation is not None and grounded:
+            end_interrupted_stream(messages, grounded, model, e)
         print(
             f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
         )
         if config.verbose:
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
-            print("message before convertion ", messages)
-
-        # Convert the messages to the GPT-4 format
-        gpt4_messages = [messages[0]]  # Include the system message
-        for message in messages[1:]:
-            if message["role"] == "user":
-                # Update the image type format from "source" to "url"
-                updated_content = []
-                for item in message["content"]:
-                    if isinstance(item, dict) and "type" in item:
-                        if item["type"] == "image":
-                            updated_content.append(
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{item['source']['data']}"
-                                    },
-                                }
-                            )
-                        else:
-                            updated_content.append(item)
-
-                gpt4_messages.append({"role": "user", "content": updated_content})
-            elif message["role"] == "assistant":
-                gpt4_messages.append(
-                    {"role": "assistant", "content": message["content"]}
-                )
+            print("[call_claude_3_with_ocr] messages", messages)
 
-        return gpt_4_fallback(gpt4_messages, objective, model)
+        # the history is provider-neutral, GPT-4 renders it as it is
+        return await gpt_4_fallback(messages, objective, model)
 
 
-async def call_o3_with_ocr(messages, objective, model):
+@traced("model")
+async def call_o3_with_ocr(messages, objective, model, on_operation=None):
     """
     Function for O3 model - uses OpenAI's O3 model.
     """
     if config.verbose:
         print("[call_o3_with_ocr]")
 
+    grounded = []
     try:
-        time.sleep(1)
-        client = config.initialize_openai()
+        client = config.initialize_openai(asynchronous=True)
 
         confirm_system_prompt(messages, objective, model)
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
+        frame = await run_blocking(capture_frame, screenshot_filename)
+
+        if config.speculative_ocr:
+            # start reading the screenshot while the model request is in flight
+            await run_blocking(submit_ocr, frame)
 
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        image = await run_blocking(get_upload_image, frame, model)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        vision_message = user_message(text_part(user_prompt), image_part(image))
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        ground, grounded = make_grounder(frame, "call_o3_with_ocr", on_operation)
+        content = await create_chat_completion(
+            client,
+            ground,
             model="o3",  # Use the actual O3 model
-            messages=messages,
+            messages=render_messages(messages, "openai"),
         )
-
-        content = response.choices[0].message.content
         content = clean_json(content)
         content_str = content
 
         content = json.loads(content)
 
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print("[call_o3_with_ocr][click] text_to_click", text_to_click)
-                
-                # Use OCR to find text coordinates
-                reader = easyocr.Reader(["en"])
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
-
-                # Add coordinates to the operation
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
-
-                if config.verbose:
-                    print("[call_o3_with_ocr][click] coordinates", coordinates)
-                    print("[call_o3_with_ocr][click] final operation", operation)
-                
-                processed_content.append(operation)
-            else:
-                processed_content.append(operation)
+        processed_content = await ground_operations(
+            content, frame, "call_o3_with_ocr", grounded
+        )
 
         # Add assistant message to conversation history
         assistant_message = {"role": "assistant", "content": content_str}
@@ -1156,6 +884,8 @@ async def call_o3_with_ocr(messages, objective, model):
         return processed_content
 
     except Exception as e:
+        if on_operation is not None and grounded:
+            end_interrupted_stream(messages, grounded, model, e)
         print(
             f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
         )
@@ -1163,10 +893,11 @@ async def call_o3_with_ocr(messages, objective, model):
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
         # Fallback to GPT-4 if O3 fails
-        return gpt_4_fallback(messages, objective, model)
+        return await gpt_4_fallback(messages, objective, model)
 
 
-async def call_o4_mini_with_ocr(messages, objective, model):
+@traced("model")
+async def call_o4_mini_with_ocr(messages, objective, model, on_operation=None):
     """
     Function for O4-mini model - uses OpenAI's O4-mini model.
     Faster and cheaper than O3.
@@ -1174,79 +905,45 @@ async def call_o4_mini_with_ocr(messages, objective, model):
     if config.verbose:
         print("[call_o4_mini_with_ocr]")
 
+    grounded = []
     try:
-        time.sleep(1)
-        client = config.initialize_openai()
+        client = config.initialize_openai(asynchronous=True)
 
         confirm_system_prompt(messages, objective, model)
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
+        frame = await run_blocking(capture_frame, screenshot_filename)
+
+        if config.speculative_ocr:
+            # start reading the screenshot while the model request is in flight
+            await run_blocking(submit_ocr, frame)
 
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        image = await run_blocking(get_upload_image, frame, model)
 
         if len(messages) == 1:
             user_prompt = get_user_first_message_prompt()
         else:
             user_prompt = get_user_prompt()
 
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        vision_message = user_message(text_part(user_prompt), image_part(image))
         messages.append(vision_message)
 
-        response = client.chat.completions.create(
+        ground, grounded = make_grounder(frame, "call_o4_mini_with_ocr", on_operation)
+        content = await create_chat_completion(
+            client,
+            ground,
             model="o4-mini",  # Use the O4-mini model
-            messages=messages,
+            messages=render_messages(messages, "openai"),
         )
-
-        content = response.choices[0].message.content
         content = clean_json(content)
         content_str = content
 
         content = json.loads(content)
 
-        processed_content = []
-
-        for operation in content:
-            if operation.get("operation") == "click":
-                text_to_click = operation.get("text")
-                if config.verbose:
-                    print("[call_o4_mini_with_ocr][click] text_to_click", text_to_click)
-                
-                # Use OCR to find text coordinates
-                reader = easyocr.Reader(["en"])
-                result = reader.readtext(screenshot_filename)
-
-                text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
-                )
-                coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
-                )
-
-                # Add coordinates to the operation
-                operation["x"] = coordinates["x"]
-                operation["y"] = coordinates["y"]
-
-                if config.verbose:
-                    print("[call_o4_mini_with_ocr][click] coordinates", coordinates)
-                    print("[call_o4_mini_with_ocr][click] final operation", operation)
-                
-                processed_content.append(operation)
-            else:
-                processed_content.append(operation)
+        processed_content = await ground_operations(
+            content, frame, "call_o4_mini_with_ocr", grounded
+        )
 
         # Add assistant message to conversation history
         assistant_message = {"role": "assistant", "content": content_str}
@@ -1255,6 +952,8 @@ async def call_o4_mini_with_ocr(messages, objective, model):
         return processed_content
 
     except Exception as e:
+        if on_operation is not None and grounded:
+            end_interrupted_stream(messages, grounded, model, e)
         print(
             f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_BRIGHT_MAGENTA}[{model}] That did not work. Trying another method {ANSI_RESET}"
         )
@@ -1262,9 +961,10 @@ async def call_o4_mini_with_ocr(messages, objective, model):
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
         # Fallback to GPT-4 if O4-mini fails
-        return gpt_4_fallback(messages, objective, model)
+        return await gpt_4_fallback(messages, objective, model)
 
 
+@traced("model")
 async def call_my_custom_model(messages, objective, model):
     """
     Example function for your custom model.
@@ -1274,25 +974,24 @@ async def call_my_custom_model(messages, objective, model):
         print("[call_my_custom_model]")
 
     try:
-        time.sleep(1)
         # Initialize your custom model client
         client = config.initialize_my_custom_model()
 
         # Confirm system prompt (this ensures the right system message is set)
         confirm_system_prompt(messages, objective, model)
         
-        # Create screenshots directory if it doesn't exist
         screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
 
         # Capture screenshot
         screenshot_filename = os.path.join(screenshots_dir, "screenshot.png")
-        capture_screen_with_cursor(screenshot_filename)
+        frame = await run_blocking(capture_frame, screenshot_filename)
 
-        # Convert screenshot to base64
-        with open(screenshot_filename, "rb") as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode("utf-8")
+        if config.speculative_ocr:
+            # start reading the screenshot while the model request is in flight
+            await run_blocking(submit_ocr, frame)
+
+        # Encode screenshot into the frame store
+        image = await run_blocking(get_upload_image, frame, model)
 
         # Get the appropriate prompt based on message count
         if len(messages) == 1:
@@ -1301,24 +1000,15 @@ async def call_my_custom_model(messages, objective, model):
             user_prompt = get_user_prompt()
 
         # Create the message with image and text
-        vision_message = {
-            "role": "user",
-            "content": [
-                {"type": "text", "text": user_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_base64}"},
-                },
-            ],
-        }
+        vision_message = user_message(text_part(user_prompt), image_part(image))
         messages.append(vision_message)
 
         # Call your custom model API
         # Replace this with your actual API call
         # Example:
-        # response = client.chat.completions.create(
+        # response = await client.chat.completions.create(
         #     model="your-model-name",
-        #     messages=messages,
+        #     messages=render_messages(messages, "openai"),
         #     max_tokens=1000,
         # )
         # content = response.choices[0].message.content
@@ -1343,14 +1033,13 @@ async def call_my_custom_model(messages, objective, model):
                     print("[call_my_custom_model][click] text_to_click", text_to_click)
                 
                 # Use OCR to find text coordinates (if needed)
-                reader = easyocr.Reader(["en"])
-                result = reader.readtext(screenshot_filename)
+                result = await get_ocr_result_async(frame)
 
                 text_element_index = get_text_element(
-                    result, text_to_click, screenshot_filename
+                    result, text_to_click, frame
                 )
                 coordinates = get_text_coordinates(
-                    result, text_element_index, screenshot_filename
+                    result, text_element_index, frame
                 )
 
                 # Add coordinates to the operation
@@ -1379,7 +1068,145 @@ async def call_my_custom_model(messages, objective, model):
             print("[Self-Operating Computer][Operate] error", e)
             traceback.print_exc()
         # Fallback to GPT-4 if your model fails
-        return gpt_4_fallback(messages, objective, model)
+        return await gpt_4_fallback(messages, objective, model)
+
+
+async def ground_operation(operation, frame, caller):
+    """
+    Adds the screen position of the text a `click` operation names, read from
+    `frame` with OCR. Other operations are returned as they are.
+    """
+    if operation.get("operation") != "click":
+        return operation
+    text_to_click = operation.get("text")
+    if config.verbose:
+        print(f"[{caller}][click] text_to_click", text_to_click)
+    # Read the screenshot, reusing the OCR pass of earlier clicks on the same frame
+    result = await get_ocr_result_async(frame)
+
+    text_element_index = get_text_element(result, text_to_click, frame)
+    coordinates = get_text_coordinates(result, text_element_index, frame)
+
+    # add `coordinates`` to `content`
+    operation["x"] = coordinates["x"]
+    operation["y"] = coordinates["y"]
+
+    if config.verbose:
+        print(f"[{caller}][click] text_element_index", text_element_index)
+        print(f"[{caller}][click] coordinates", coordinates)
+        print(f"[{caller}][click] final operation", operation)
+    return operation
+
+
+async def ground_operations(content, frame, caller, grounded=()):
+    """
+    Grounds every operation of a reply. The first `len(grounded)` operations
+    were already grounded while the reply streamed in and are reused.
+    """
+    processed_content = list(grounded)
+    for operation in content[len(grounded) :]:
+        processed_content.append(await ground_operation(operation, frame, caller))
+    return processed_content
+
+
+def make_grounder(frame, caller, on_operation=None):
+    """
+    Returns a callback for operations streamed from the model, which grounds
+    each one and passes it to `on_operation`, and the list they are collected in.
+    """
+    grounded = []
+
+    async def ground(operation):
+        grounded.append(await ground_operation(operation, frame, caller))
+        if on_operation is not None:
+            await on_operation(grounded[-1])
+
+    return ground, grounded
+
+
+async def stream_operations(chunks, on_operation):
+    """
+    Collects the text of a streamed reply, awaiting `on_operation` with every
+    operation as soon as its JSON object is complete.
+
+    Returns:
+        str: The full reply.
+    """
+    parser = OperationStreamParser()
+    async for chunk in chunks:
+        for operation in parser.feed(chunk):
+            turn = current_turn()
+            if turn is not None and "first_operation" not in turn.metrics:
+                turn.set_metric("first_operation", round(turn.offset(), 4))
+            if config.verbose:
+                print("[stream_operations] operation", operation)
+            await on_operation(operation)
+    return parser.text
+
+
+async def create_chat_completion(client, on_operation=None, **params):
+    """
+    Requests an OpenAI chat completion and returns its text. With `config.stream`
+    and an `on_operation` callback the reply is streamed, so the first
+    operations can be grounded and executed while the rest is still generating.
+    """
+    if not config.stream or on_operation is None:
+        response = await timed("model", client.chat.completions.create(**params))
+        record_usage(response)
+        return response.choices[0].message.content
+
+    async def chunks():
+        # sent as an extra field: openai==1.2.3 has no `stream_options` argument
+        # and no `usage` on chunks, newer servers still honor it
+        stream = await client.chat.completions.create(
+            stream=True,
+            extra_body={"stream_options": {"include_usage": True}},
+            **params,
+        )
+        async for chunk in stream:
+            if get_field(chunk, "usage") is not None:
+                record_usage(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    with measure("model"):
+        return await stream_operations(chunks(), on_operation)
+
+
+async def create_message(client, on_operation=None, **params):
+    """
+    Like `create_chat_completion`, for the Anthropic Messages API.
+    """
+    if not config.stream or on_operation is None:
+        response = await timed("model", client.messages.create(**params))
+        record_usage(response)
+        return response.content[0].text
+
+    async def chunks():
+        stream = await client.messages.create(stream=True, **params)
+        async for event in stream:
+            if event.type == "message_start":
+                record_usage(event.message)
+            elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                yield event.delta.text
+
+    with measure("model"):
+        return await stream_operations(chunks(), on_operation)
+
+
+def end_interrupted_stream(messages, grounded, model, error):
+    """
+    Ends a streamed reply that failed after some of its operations were started.
+    A fallback would capture a new screenshot while they are still running and
+    could repeat them, so the started operations are recorded as the reply and
+    the turn ends; the next turn starts from a fresh screenshot.
+    """
+    print(
+        f"{ANSI_GREEN}[Self-Operating Computer]{ANSI_RED}[Error] The reply failed after {len(grounded)} operation(s) started, continuing next turn {ANSI_RESET}",
+        error,
+    )
+    messages.append({"role": "assistant", "content": json.dumps(grounded)})
+    raise StreamInterruptedException(model, len(grounded)) from error
 
 
 def get_last_assistant_message(messages):
@@ -1396,20 +1223,71 @@ def get_last_assistant_message(messages):
     return None  # Return None if no assistant message is found
 
 
-def gpt_4_fallback(messages, objective, model):
+@traced("model")
+async def gpt_4_fallback(messages, objective, model):
     if config.verbose:
         print("[gpt_4_fallback]")
-    system_prompt = get_system_prompt("gpt-4o", objective)
-    new_system_message = {"role": "system", "content": system_prompt}
-    # remove and replace the first message in `messages` with `new_system_message`
-
-    messages[0] = new_system_message
+    set_system_prompt(messages, get_system_prompt("gpt-4o", objective))
 
     if config.verbose:
         print("[gpt_4_fallback][updated]")
         print("[gpt_4_fallback][updated] len(messages)", len(messages))
 
-    return call_gpt_4o(messages)
+    return await call_gpt_4o(messages)
+
+
+def set_system_prompt(messages, system_prompt):
+    """
+    Makes `system_prompt` the first message. The message is only replaced when
+    the prompt changed, e.g. after a fallback, so the request prefix stays
+    byte-identical between turns and providers can serve it from their prompt cache.
+    """
+    if messages[0]["content"] != system_prompt:
+        messages[0] = {"role": "system", "content": system_prompt}
+
+
+def get_field(value, name):
+    """
+    Reads `name` from an SDK object or, for fields older SDKs don't model and
+    keep as plain dicts (e.g. `usage` on a stream chunk), from a dict.
+    """
+    if isinstance(value, dict):
+        return value.get(name)
+    return getattr(value, name, None)
+
+
+def record_usage(response):
+    """
+    Adds the prompt tokens of a response, and how many of them the provider read
+    from or wrote to its prompt cache, to the metrics of the current turn.
+    """
+    usage = get_field(response, "usage")
+    if usage is None:
+        return
+    if get_field(usage, "prompt_tokens") is not None:
+        # OpenAI caches automatically and counts cached tokens as prompt tokens
+        prompt_tokens = get_field(usage, "prompt_tokens") or 0
+        details = get_field(usage, "prompt_tokens_details")
+        cached_tokens = get_field(details, "cached_tokens") or 0
+        cache_write_tokens = 0
+    else:
+        # Anthropic counts cache reads and writes apart from `input_tokens`
+        cached_tokens = get_field(usage, "cache_read_input_tokens") or 0
+        cache_write_tokens = get_field(usage, "cache_creation_input_tokens") or 0
+        prompt_tokens = (
+            (get_field(usage, "input_tokens") or 0) + cached_tokens + cache_write_tokens
+        )
+
+    turn = current_turn()
+    if turn is not None:
+        turn.add_metric("prompt_tokens", prompt_tokens)
+        turn.add_metric("cached_tokens", cached_tokens)
+        turn.add_metric("cache_write_tokens", cache_write_tokens)
+    if config.verbose:
+        print(
+            f"[record_usage] {cached_tokens} of {prompt_tokens} prompt tokens read from cache, "
+            f"{cache_write_tokens} written"
+        )
 
 
 def confirm_system_prompt(messages, objective, model):
@@ -1419,11 +1297,7 @@ def confirm_system_prompt(messages, objective, model):
     if config.verbose:
         print("[confirm_system_prompt] model", model)
 
-    system_prompt = get_system_prompt(model, objective)
-    new_system_message = {"role": "system", "content": system_prompt}
-    # remove and replace the first message in `messages` with `new_system_message`
-
-    messages[0] = new_system_message
+    set_system_prompt(messages, get_system_prompt(model, objective))
 
     if config.verbose:
         print("[confirm_system_prompt]")
@@ -0,0 +1,208 @@
+import io
+import math
+
+from PIL import Image
+
+from operate.config import Config
+from operate.models.conversation import image_part, text_part
+from operate.utils.frame_store import frame_store
+from operate.utils.screenshot import (
+    MODEL_UPLOAD_PROFILES,
+    get_upload_profile,
+    get_upload_size,
+)
+from operate.utils.timing import current_turn
+
+# Load configuration
+config = Config()
+
+# Older screenshots are re-encoded to fit in THUMBNAIL_EDGE pixels
+THUMBNAIL_EDGE = 512
+THUMBNAIL_QUALITY = 60
+OMITTED_SCREENSHOT = "[An earlier screenshot was removed to save space]"
+
+# Rough text cost, in characters per token
+CHARACTERS_PER_TOKEN = 4
+
+
+def get_image_parts(message):
+    """
+    Returns the image parts of a message's content.
+    """
+    content = message.get("content")
+    if not isinstance(content, list):
+        return []
+    return [part for part in content if part["type"] == "image"]
+
+
+def replace_part(messages, index, part, new_part):
+    """
+    Replaces `part` of `messages[index]` with `new_part`. The message itself is
+    replaced by a copy, as messages in the history are never changed in place.
+    """
+    message = messages[index]
+    messages[index] = dict(
+        message,
+        content=[new_part if item is part else item for item in message["content"]],
+    )
+
+
+def estimate_image_tokens(size, model):
+    """
+    Estimates the input tokens an image of `size` costs with `model`'s provider,
+    after the provider's own downscaling.
+    """
+    width, height = get_upload_size(size, get_upload_profile(model))
+    if MODEL_UPLOAD_PROFILES.get(model) == "anthropic":
+        return math.ceil(width * height / 750)
+    # OpenAI high detail: 170 tokens per 512 px tile plus a fixed 85
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def estimate_message_cost(message, model):
+    """
+    Returns the estimated (tokens, bytes) of one message.
+    """
+    content = message.get("content")
+    text_size, image_tokens, image_size = 0, 0, 0
+    if isinstance(content, str):
+        text_size = len(content)
+    elif isinstance(content, list):
+        for part in content:
+            if part["type"] == "text":
+                text_size += len(part["text"])
+            elif part["type"] == "image":
+                image = part["image"]
+                image_tokens += estimate_image_tokens(image.size, model)
+                image_size += image.base64_length
+    return text_size // CHARACTERS_PER_TOKEN + image_tokens, text_size + image_size
+
+
+def estimate_context_cost(messages, model):
+    """
+    Returns the estimated (tokens, bytes) of a whole request.
+    """
+    tokens, size = 0, 0
+    for message in messages:
+        message_tokens, message_size = estimate_message_cost(message, model)
+        tokens += message_tokens
+        size += message_size
+    return tokens, size
+
+
+def make_thumbnail(image):
+    """
+    Re-encodes a stored image to fit in THUMBNAIL_EDGE pixels.
+
+    Returns:
+        ImageRef: The thumbnail, in the frame store.
+    """
+    with Image.open(io.BytesIO(frame_store.get(image))) as thumbnail:
+        thumbnail = thumbnail.convert("RGB")
+        thumbnail.thumbnail((THUMBNAIL_EDGE, THUMBNAIL_EDGE), Image.Resampling.BILINEAR)
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, format="JPEG", quality=THUMBNAIL_QUALITY)
+    return frame_store.put(buffer.getvalue(), "image/jpeg", thumbnail.size)
+
+
+def omit_image_part(messages, index, part):
+    replace_part(messages, index, part, text_part(OMITTED_SCREENSHOT))
+
+
+def drop_oldest_turn(messages):
+    """
+    Removes the oldest user message after the system prompt together with the
+    replies that follow it, so the history still starts with a user message.
+    Keeps at least the last two messages.
+
+    Returns:
+        bool: Whether anything was removed.
+    """
+    if len(messages) <= 3:
+        return False
+    del messages[1]
+    while len(messages) > 3 and messages[1].get("role") != "user":
+        del messages[1]
+    return True
+
+
+def compact_context(messages, model):
+    """
+    Bounds the history before the next request, in place. The system prompt
+    and every text message, including the assistant's JSON replies, are kept;
+    only screenshots are downgraded:
+
+    - the newest `config.context_full_frames - 1` screenshots stay as they are
+      (the frame about to be captured is the last full one),
+    - the `config.context_thumbnail_frames` before them become thumbnails,
+    - older ones are replaced by a short note.
+
+    If the estimate, with room for the next screenshot, still exceeds
+    `config.context_token_budget`, the oldest remaining screenshots and then
+    the oldest turns are dropped until it fits.
+
+    Returns:
+        dict: Estimated tokens and bytes before and after, and what was changed.
+    """
+    tokens_before, bytes_before = estimate_context_cost(messages, model)
+    stats = {"thumbnails": 0, "omitted": 0, "dropped_turns": 0}
+
+    images = [
+        (index, part)
+        for index in range(1, len(messages))
+        for part in get_image_parts(messages[index])
+    ]
+    older = images[: max(0, len(images) - max(0, config.context_full_frames - 1))]
+    first_thumbnail = max(0, len(older) - config.context_thumbnail_frames)
+    for position, (index, part) in enumerate(older):
+        if position >= first_thumbnail:
+            if max(part["image"].size) > THUMBNAIL_EDGE:
+                thumbnail = image_part(make_thumbnail(part["image"]))
+                replace_part(messages, index, part, thumbnail)
+                stats["thumbnails"] += 1
+        else:
+            omit_image_part(messages, index, part)
+            stats["omitted"] += 1
+
+    budget = config.context_token_budget
+    if budget:
+        # leave room for the screenshot of this turn, about the size of the last one
+        remaining = [
+            (index, part)
+            for index in range(1, len(messages))
+            for part in get_image_parts(messages[index])
+        ]
+        next_size = remaining[-1][1]["image"].size if remaining else (1920, 1080)
+        reserve = estimate_image_tokens(next_size, model)
+        tokens, _ = estimate_context_cost(messages, model)
+        while tokens + reserve > budget:
+            if remaining:
+                index, part = remaining.pop(0)
+                omit_image_part(messages, index, part)
+                stats["omitted"] += 1
+            elif drop_oldest_turn(messages):
+                stats["dropped_turns"] += 1
+            else:
+                break
+            tokens, _ = estimate_context_cost(messages, model)
+
+    tokens_after, bytes_after = estimate_context_cost(messages, model)
+    stats.update(
+        {
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+        }
+    )
+    turn = current_turn()
+    if turn is not None:
+        turn.set_metric("context_tokens", tokens_after)
+        turn.set_metric("context_bytes", bytes_after)
+    if config.verbose:
+        print(
+            f"[compact_context] {len(messages)} messages, ~{tokens_before} -> ~{tokens_after} tokens, "
+            f"{bytes_before} -> {bytes_after} bytes, {stats['thumbnails']} thumbnailed, "
+            f"{stats['omitted']} omitted, {stats['dropped_turns']} turns dropped"
+        )
+    return stats
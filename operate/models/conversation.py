@@ -0,0 +1,215 @@
+"""
+The conversation is kept in one provider-neutral format and rendered for the
+provider of each request:
+
+    {"role": "system" | "user" | "assistant", "content": str or [parts]}
+
+where a part is `{"type": "text", "text": str}` or `{"type": "image", "image": ImageRef}`.
+
+Messages are treated as immutable once they are in the history: code that
+changes one (e.g. context compaction) puts a new dict in its place. Renderers
+rely on this to cache each rendered message by identity, so a turn only
+renders what was added or replaced since the last request, and switching
+providers mid-session renders the history once for the new provider.
+"""
+
+from operate.config import Config
+from operate.utils.frame_store import frame_store
+from operate.utils.timing import current_turn
+
+# Load configuration
+config = Config()
+
+# Anthropic caches the prompt up to every block marked with this
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def text_part(text):
+    return {"type": "text", "text": text}
+
+
+def image_part(image):
+    return {"type": "image", "image": image}
+
+
+def user_message(*parts):
+    return {"role": "user", "content": list(parts)}
+
+
+def has_image(message):
+    content = message["content"]
+    return not isinstance(content, str) and any(
+        part["type"] == "image" for part in content
+    )
+
+
+def get_stable_length(messages):
+    """
+    Returns how many leading messages later requests will send unchanged.
+    Context compaction only rewrites messages that still hold a screenshot,
+    so the history is stable up to the first of them.
+    """
+    for index, message in enumerate(messages):
+        if has_image(message):
+            return index
+    return len(messages)
+
+
+def get_message_text(message):
+    """
+    Returns the text of a message, with its parts joined by newlines.
+    """
+    content = message["content"]
+    if isinstance(content, str):
+        return content
+    return "\n".join(part["text"] for part in content if part["type"] == "text")
+
+
+class Renderer:
+    """
+    Renders neutral messages into one provider's format, reusing the rendering
+    of every message it has already seen in the previous request.
+    """
+
+    provider = None
+
+    def __init__(self):
+        self._cache = {}
+
+    def render(self, messages):
+        """
+        Returns the messages in the provider's format. Rendered messages may be
+        shared with later requests and must not be modified.
+        """
+        cache = {}
+        rendered = []
+        new = 0
+        for message in messages:
+            entry = self._cache.get(id(message))
+            # the message is kept in the entry so its id can't be reused meanwhile
+            if entry is None or entry[0] is not message:
+                entry = (message, self.render_message(message))
+                new += 1
+            cache[id(message)] = entry
+            rendered.append(entry[1])
+        # only the current history is kept, so the cache never outgrows it
+        self._cache = cache
+
+        turn = current_turn()
+        if turn is not None:
+            turn.set_metric("rendered_messages", new)
+        if config.verbose:
+            print(
+                f"[render_messages] {self.provider}: rendered {new} of {len(messages)} messages"
+            )
+        return rendered
+
+    def render_message(self, message):
+        content = message["content"]
+        if not has_image(message):
+            return message
+        return dict(message, content=[self.render_part(part) for part in content])
+
+    def render_part(self, part):
+        raise NotImplementedError
+
+
+class OpenAIRenderer(Renderer):
+    provider = "openai"
+
+    def render_part(self, part):
+        if part["type"] != "image":
+            return part
+        return {
+            "type": "image_url",
+            "image_url": {"url": frame_store.data_url(part["image"])},
+        }
+
+
+class AnthropicRenderer(Renderer):
+    """
+    Renders for the Anthropic Messages API. The system message is rendered as
+    is; callers pass its content as `system` and the rest as `messages`.
+    """
+
+    provider = "anthropic"
+
+    def render_part(self, part):
+        if part["type"] != "image":
+            return part
+        image = part["image"]
+        return {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": image.media_type,
+                "data": frame_store.base64(image),
+            },
+        }
+
+
+class OllamaRenderer(Renderer):
+    """
+    Renders for Ollama chat, as plain text. Ollama tries to load every image in
+    the history on each request and eventually times out, so images are only
+    attached to the last message, with `get_ollama_images`.
+    """
+
+    provider = "ollama"
+
+    def render_message(self, message):
+        return {"role": message["role"], "content": get_message_text(message)}
+
+
+def get_ollama_images(message):
+    content = message["content"]
+    if isinstance(content, str):
+        return []
+    return [
+        frame_store.base64(part["image"]) for part in content if part["type"] == "image"
+    ]
+
+
+RENDERERS = {
+    renderer.provider: renderer
+    for renderer in (OpenAIRenderer(), AnthropicRenderer(), OllamaRenderer())
+}
+
+
+def render_messages(messages, provider):
+    """
+    Renders the conversation for `provider` ("openai", "anthropic" or "ollama").
+    """
+    return RENDERERS[provider].render(messages)
+
+
+def with_cache_control(message):
+    """
+    Returns a copy of a rendered Anthropic message with a cache breakpoint on its last block.
+    """
+    content = message["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    content = content[:-1] + [dict(content[-1], cache_control=CACHE_CONTROL)]
+    return dict(message, content=content)
+
+
+def render_anthropic_request(messages):
+    """
+    Renders the conversation for the Anthropic Messages API, with prompt cache
+    breakpoints on the system prompt and on the last stable message, so the
+    next turn reads both from the cache.
+
+    Returns:
+        tuple: The `system` blocks and the `messages` of the request.
+    """
+    rendered = render_messages(messages, "anthropic")
+    system = [
+        {"type": "text", "text": rendered[0]["content"], "cache_control": CACHE_CONTROL}
+    ]
+    rendered = rendered[1:]
+    stable = min(get_stable_length(messages), len(messages) - 1)
+    if stable > 1:
+        # rendered messages are shared between requests, the breakpoint goes on a copy
+        rendered[stable - 2] = with_cache_control(rendered[stable - 2])
+    return system, rendered
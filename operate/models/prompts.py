@@ -4,6 +4,9 @@ from operate.config import Config
 # Load configuration
 config = Config()
 
+# Formatted system prompts, keyed by (model, objective)
+_system_prompts = {}
+
 # General user Prompts
 USER_QUESTION = "Hello, I can help you with anything. What would you like done?"
 
@@ -209,9 +212,23 @@ Action:"""
 
 def get_system_prompt(model, objective):
     """
-    Format the vision prompt more efficiently and print the name of the prompt used
+    Format the vision prompt more efficiently and print the name of the prompt used.
+    The prompt is formatted once per model and objective, and the same string is
+    returned after that, so it stays byte-identical for the providers' prompt caches.
     """
+    key = (model, objective)
+    if key not in _system_prompts:
+        _system_prompts[key] = format_system_prompt(model, objective)
+
+    # Optional verbose output
+    if config.verbose:
+        print("[get_system_prompt] model:", model)
+    # print("[get_system_prompt] prompt:", _system_prompts[key])
+
+    return _system_prompts[key]
 
+
+def format_system_prompt(model, objective):
     if platform.system() == "Darwin":
         cmd_string = "\"command\""
         os_search_str = "[\"command\", \"space\"]"
@@ -249,11 +266,6 @@ def get_system_prompt(model, objective):
             operating_system=operating_system,
         )
 
-    # Optional verbose output
-    if config.verbose:
-        print("[get_system_prompt] model:", model)
-    # print("[get_system_prompt] prompt:", prompt)
-
     return prompt
 
 
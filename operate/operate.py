@@ -4,7 +4,7 @@ import time
 import asyncio
 from prompt_toolkit.shortcuts import message_dialog
 from prompt_toolkit import prompt
-from operate.exceptions import ModelNotRecognizedException
+from operate.exceptions import ModelNotRecognizedException, StreamInterruptedException
 import platform
 
 # from operate.models.prompts import USER_QUESTION, get_system_prompt
@@ -23,14 +23,44 @@ from operate.utils.style import (
     style,
 )
 from operate.utils.operating_system import OperatingSystem
-from operate.models.apis import get_next_action
+from operate.models.apis import OCR_MODELS, get_next_action
+from operate.utils.label import warm_up_yolo_model
+from operate.utils.ocr import warm_up_ocr_reader
+from operate.utils.capture import init_capture_backend
+from operate.utils.misc import run_blocking
+from operate.utils.actions import ActionExecutor, coalesce_operations
+from operate.utils.timing import current_turn, export_timings, start_turn
+from operate.utils.tracing import span, tracer
 
 # Load configuration
 config = Config()
 operating_system = OperatingSystem()
+action_executor = ActionExecutor(operating_system)
 
 
-def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
+def main(
+    model,
+    terminal_prompt,
+    voice_mode=False,
+    verbose_mode=False,
+    warm_up=True,
+    speculative_ocr=False,
+    save_screenshots=False,
+    image_format=None,
+    image_quality=None,
+    settle_timings=None,
+    write_strategy="auto",
+    write_interval=0.0,
+    demo_mouse=False,
+    timings_file=None,
+    trace_file=None,
+    capture_backend="auto",
+    incremental_ocr=False,
+    context_full_frames=2,
+    context_thumbnail_frames=2,
+    context_token_budget=60000,
+    stream=False,
+):
     """
     Main function for the Self-Operating Computer.
 
@@ -38,6 +68,23 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
     - model: The model used for generating responses.
     - terminal_prompt: A string representing the prompt provided in the terminal.
     - voice_mode: A boolean indicating whether to enable voice mode.
+    - warm_up: A boolean indicating whether to preload local vision models in the background.
+    - speculative_ocr: A boolean indicating whether to run OCR while the model request is in flight.
+    - save_screenshots: A boolean indicating whether to write each screenshot and labeled image to disk.
+    - image_format: Overrides the format images are encoded with before upload (PNG, JPEG or WEBP).
+    - image_quality: Overrides the quality used for lossy upload formats.
+    - settle_timings: A dict of operation type to (min, max) seconds to wait for the screen to settle.
+    - write_strategy: How text is entered: "type", "paste" or "auto".
+    - write_interval: The seconds between keystrokes when typing.
+    - demo_mouse: A boolean indicating whether to animate the cursor before each click.
+    - timings_file: A path to append each turn's latency breakdown to as JSON lines.
+    - trace_file: A path to write a Chrome trace of the session to at exit.
+    - capture_backend: The screen capture backend: "auto", "mss", "xlib" or "legacy".
+    - incremental_ocr: A boolean indicating whether OCR only re-reads the parts of the screen that changed.
+    - context_full_frames: The number of the newest screenshots sent at full resolution.
+    - context_thumbnail_frames: The number of older screenshots sent as thumbnails.
+    - context_token_budget: The estimated input tokens a request may use, None for no limit.
+    - stream: A boolean indicating whether to execute operations while the model reply is still streaming.
 
     Returns:
     None
@@ -47,8 +94,34 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
     # Initialize `WhisperMic`, if `voice_mode` is True
 
     config.verbose = verbose_mode
+    config.speculative_ocr = speculative_ocr
+    config.incremental_ocr = incremental_ocr
+    config.context_full_frames = context_full_frames
+    config.context_thumbnail_frames = context_thumbnail_frames
+    config.context_token_budget = context_token_budget
+    config.stream = stream
+    config.save_screenshots = save_screenshots
+    config.image_format = image_format
+    config.image_quality = image_quality
+    if settle_timings:
+        config.settle_timings.update(settle_timings)
+    config.write_strategy = write_strategy
+    config.write_interval = write_interval
+    config.demo_mouse = demo_mouse
+    config.timings_file = timings_file
+    config.trace_file = trace_file
+    if trace_file:
+        tracer.enable(trace_file)
+    config.capture_backend = capture_backend
+    init_capture_backend(capture_backend)
     config.validation(model, voice_mode)
 
+    # Load the OCR and YOLO weights while the user is still typing the objective
+    if warm_up and model in OCR_MODELS:
+        warm_up_ocr_reader(["en"])
+    if warm_up and model == "gpt-4-with-som":
+        warm_up_yolo_model()
+
     if voice_mode:
         try:
             from whisper_mic import WhisperMic
@@ -104,15 +177,31 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
 
     session_id = None
 
+    # One event loop for the whole session, so async API clients keep their
+    # connections and blocking work offloaded to executors can overlap
+    event_loop = asyncio.new_event_loop()
+
     while True:
         if config.verbose:
             print("[Self Operating Computer] loop_count", loop_count)
         try:
-            operations, session_id = asyncio.run(
-                get_next_action(model, messages, objective, session_id)
-            )
+            turn_timings = start_turn(loop_count)
+            with span("turn", "turn", turn=loop_count):
+                if config.stream:
+                    session_id, stop = event_loop.run_until_complete(
+                        stream_and_operate(model, messages, objective, session_id)
+                    )
+                else:
+                    operations, session_id = event_loop.run_until_complete(
+                        get_next_action(model, messages, objective, session_id)
+                    )
 
-            stop = operate(operations, model)
+                    stop = operate(operations, model)
+            turn_timings.finish()
+            if config.verbose:
+                print("[Self Operating Computer] timings", turn_timings.format_summary())
+            if config.timings_file:
+                export_timings(turn_timings, config.timings_file)
             if stop:
                 break
 
@@ -130,38 +219,80 @@ def main(model, terminal_prompt, voice_mode=False, verbose_mode=False):
             )
             break
 
+    event_loop.close()
+
+
+async def stream_and_operate(model, messages, objective, session_id):
+    """
+    Gets the next action with a streamed reply and executes each operation as
+    soon as it is complete, while the model is still generating the rest.
+    Operations run one at a time, in order, and nothing runs after `done`.
+
+    A fallback model only runs when no operation was started. If the reply
+    fails after that, the started operations finish and the turn ends there;
+    the next turn starts from a fresh screenshot instead of repeating them.
+
+    Returns:
+        tuple: The session id, and whether the objective is complete.
+    """
+    started = []
+    stopped = False
+    lock = asyncio.Lock()
+    tasks = []
+
+    async def execute(operation):
+        nonlocal stopped
+        # the lock is fair, so operations run in the order they were started
+        async with lock:
+            if not stopped:
+                stopped = await run_blocking(operate, [operation], model)
+
+    async def on_operation(operation):
+        if not isinstance(operation, dict) or "operation" not in operation:
+            if config.verbose:
+                print("[stream_and_operate] skipping", operation)
+            return
+        started.append(operation)
+        tasks.append(asyncio.ensure_future(execute(operation)))
+
+    try:
+        operations, session_id = await get_next_action(
+            model, messages, objective, session_id, on_operation
+        )
+        # models without streaming, or a fallback, return operations that weren't started
+        for operation in operations:
+            if not any(operation is other for other in started):
+                await on_operation(operation)
+    except StreamInterruptedException:
+        # the started operations were recorded as the reply, the next turn picks up from them
+        pass
+    finally:
+        await asyncio.gather(*tasks)
+    return session_id, stopped
+
 
 def operate(operations, model):
     if config.verbose:
         print("[Self Operating Computer][operate]")
-    for operation in operations:
+    for batch in coalesce_operations(operations):
         if config.verbose:
-            print("[Self Operating Computer][operate] operation", operation)
-        # wait one second
-        time.sleep(1)
-        operate_type = operation.get("operation").lower()
-        operate_thought = operation.get("thought")
-        operate_detail = ""
+            print("[Self Operating Computer][operate] operations", batch["operations"])
+        operate_type = batch["operation"]
+        operation = batch["operations"][-1]
+        operate_thought = " ".join(
+            operation.get("thought") or "" for operation in batch["operations"]
+        ).strip()
         if config.verbose:
             print("[Self Operating Computer][operate] operate_type", operate_type)
 
-        if operate_type == "press" or operate_type == "hotkey":
-            keys = operation.get("keys")
-            operate_detail = keys
-            operating_system.press(keys)
-        elif operate_type == "write":
-            content = operation.get("content")
-            operate_detail = content
-            operating_system.write(content)
-        elif operate_type == "click":
-            x = operation.get("x")
-            y = operation.get("y")
-            click_detail = {"x": x, "y": y}
-            operate_detail = click_detail
-
-            operating_system.mouse(click_detail)
+        if operate_type in ("press", "write", "click"):
+            operate_detail = action_executor.execute(batch)
         elif operate_type == "done":
             summary = operation.get("summary")
+            turn_timings = current_turn()
+            if turn_timings is not None:
+                now = time.perf_counter()
+                turn_timings.add_operation("done", summary, now, now, 0.0, 0.0)
 
             print(
                 f"[{ANSI_GREEN}Self-Operating Computer {ANSI_RESET}|{ANSI_BRIGHT_MAGENTA} {model}{ANSI_RESET}]"
@@ -0,0 +1,102 @@
+import time
+
+from operate.config import Config
+from operate.utils.screenshot import wait_for_screen_settle
+from operate.utils.timing import current_turn
+
+# Load configuration
+config = Config()
+
+PRESS_OPERATIONS = ("press", "hotkey")
+
+
+def coalesce_operations(operations):
+    """
+    Groups the model's operations into batches that each take one OS call:
+    adjacent `write` operations become one write of the joined content, and
+    consecutive `press`/`hotkey` operations become one key sequence. The
+    screen is only waited on once after each batch.
+
+    Args:
+        operations (list): The operations returned by the model.
+
+    Returns:
+        list: Batches as dicts with the lower-cased "operation" type and the
+        original "operations" it covers.
+    """
+    batches = []
+    for operation in operations:
+        operate_type = (operation.get("operation") or "").lower()
+        if operate_type == "hotkey":
+            operate_type = "press"
+        previous = batches[-1] if batches else None
+        if (
+            previous is not None
+            and previous["operation"] == operate_type
+            and operate_type in ("write", "press")
+        ):
+            previous["operations"].append(operation)
+        else:
+            batches.append({"operation": operate_type, "operations": [operation]})
+    return batches
+
+
+class ActionExecutor:
+    """
+    Runs batches from `coalesce_operations` on the operating system and records
+    how long actuation and the following screen settle took on the current turn.
+    """
+
+    def __init__(self, operating_system):
+        self.operating_system = operating_system
+
+    def execute(self, batch):
+        """
+        Performs one batch and waits for the screen to settle afterwards.
+
+        Returns:
+            The batch's detail: the keys, the written content or the click position.
+        """
+        operate_type = batch["operation"]
+        operations = batch["operations"]
+        start = time.perf_counter()
+
+        if operate_type == "press":
+            detail = [operation.get("keys") for operation in operations]
+            self.operating_system.press_sequence(detail)
+            if len(detail) == 1:
+                detail = detail[0]
+        elif operate_type == "write":
+            detail = "".join(operation.get("content") or "" for operation in operations)
+            self.operating_system.write(detail)
+        elif operate_type == "click":
+            operation = operations[0]
+            detail = {"x": operation.get("x"), "y": operation.get("y")}
+            self.operating_system.mouse(detail)
+        else:
+            raise ValueError(f"cannot execute operation {operate_type!r}")
+
+        actuated = time.perf_counter()
+        # let the UI react before the next operation or screenshot
+        wait_for_screen_settle(operate_type)
+        end = time.perf_counter()
+
+        turn = current_turn()
+        if turn is not None:
+            turn.add("actuation", actuated - start)
+            turn.add("settle", end - actuated)
+            turn.add_operation(
+                operate_type,
+                detail,
+                start,
+                end,
+                actuated - start,
+                end - actuated,
+                count=len(operations),
+            )
+        if config.verbose:
+            print(
+                f"[ActionExecutor][execute] {operate_type} x{len(operations)} "
+                f"actuation {actuated - start:.3f}s settle {end - actuated:.3f}s"
+            )
+        return detail
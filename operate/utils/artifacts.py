@@ -0,0 +1,64 @@
+import atexit
+import os
+import queue
+import threading
+
+from operate.config import Config
+
+# Load configuration
+config = Config()
+
+
+class ArtifactWriter:
+    """
+    Writes debug images on a background thread so PNG encoding and disk I/O
+    stay off the critical path of a turn. Pending writes are flushed at exit.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def save(self, image, file_path, format=None, **params):
+        """
+        Queues `image.save(file_path, format, **params)`. The image must not be modified afterwards.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="artifact-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+        self._queue.put((image, file_path, format, params))
+
+    def flush(self):
+        """
+        Blocks until every queued image has been written.
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            image, file_path, format, params = self._queue.get()
+            try:
+                directory = os.path.dirname(file_path)
+                if directory and not os.path.exists(directory):
+                    os.makedirs(directory)
+                image.save(file_path, format, **params)
+            except Exception as e:
+                print("[ArtifactWriter] error saving", file_path, e)
+            finally:
+                self._queue.task_done()
+
+
+artifact_writer = ArtifactWriter()
+
+
+def should_save_artifacts():
+    """
+    Debug images are only kept when screenshots are saved or in verbose mode.
+    """
+    return config.save_screenshots or config.verbose
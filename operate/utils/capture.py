@@ -0,0 +1,321 @@
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+
+import numpy as np
+import pyautogui
+from PIL import Image, ImageGrab
+import Xlib.display
+import Xlib.X
+
+from operate.config import Config
+
+# Load configuration
+config = Config()
+
+CAPTURE_BACKENDS = ("auto", "mss", "xlib", "legacy")
+
+
+class CaptureBackend:
+    """
+    Grabs the screen, or a region of it given as a `(left, top, right, bottom)`
+    box in screen pixels.
+
+    `grab` returns a PIL image. `grab_array` returns the pixels as an
+    (height, width, channels) numpy array whose channel order is only
+    guaranteed to have green at index 1, so pollers can read a luminance
+    proxy without converting the frame.
+    """
+
+    name = None
+
+    def grab(self, region=None):
+        raise NotImplementedError
+
+    def grab_array(self, region=None):
+        return np.asarray(self.grab(region))
+
+    def close(self):
+        pass
+
+
+class FixtureBackend(CaptureBackend):
+    """
+    Returns a fixture image file instead of the screen, for offline benchmarks
+    and tests. The file is reloaded only when it changes, so a benchmark can
+    swap the screen between turns by rewriting it.
+    """
+
+    name = "fixture"
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._modified = None
+        self._image = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        modified = os.path.getmtime(self.file_path)
+        with self._lock:
+            if self._image is None or self._modified != modified:
+                with Image.open(self.file_path) as img:
+                    img.load()
+                    self._image = img.convert("RGB")
+                self._modified = modified
+            return self._image
+
+    def grab(self, region=None):
+        image = self._load()
+        return image.crop(region) if region else image.copy()
+
+    def grab_array(self, region=None):
+        image = self._load()
+        return np.asarray(image.crop(region) if region else image)
+
+
+class MssBackend(CaptureBackend):
+    """
+    Captures through `mss`, which reads the framebuffer straight into memory
+    without going through PNG or a helper process. `mss` instances can't be
+    shared between threads, so each thread keeps its own open connection.
+    `grab_array` is a view on the captured BGRA buffer, no copy is made.
+    """
+
+    name = "mss"
+
+    def __init__(self):
+        import mss
+
+        self._mss = mss
+        self._local = threading.local()
+        self._instances = []
+        self._lock = threading.Lock()
+        # On Linux the X root window spans every monitor, like the legacy grab.
+        # Elsewhere the primary monitor matches what pyautogui clicks on.
+        self._monitor_index = 0 if platform.system() == "Linux" else 1
+        self.grab_array()  # fail here, at selection time, when mss can't capture
+
+    def _instance(self):
+        instance = getattr(self._local, "instance", None)
+        if instance is None:
+            instance = self._mss.mss()
+            self._local.instance = instance
+            with self._lock:
+                self._instances.append(instance)
+        return instance
+
+    def _grab(self, region):
+        instance = self._instance()
+        if region:
+            left, top, right, bottom = region
+            area = {
+                "left": left,
+                "top": top,
+                "width": right - left,
+                "height": bottom - top,
+            }
+        else:
+            area = instance.monitors[self._monitor_index]
+        return instance.grab(area)
+
+    def grab(self, region=None):
+        shot = self._grab(region)
+        return Image.frombuffer("RGB", shot.size, shot.bgra, "raw", "BGRX", 0, 1)
+
+    def grab_array(self, region=None):
+        shot = self._grab(region)
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(
+            shot.height, shot.width, 4
+        )
+
+    def close(self):
+        with self._lock:
+            for instance in self._instances:
+                instance.close()
+            self._instances = []
+        self._local = threading.local()
+
+
+class XlibBackend(CaptureBackend):
+    """
+    Captures the X root window over one persistent Xlib connection instead of
+    opening a new one per capture. Linux only.
+    """
+
+    name = "xlib"
+
+    def __init__(self):
+        self._display = Xlib.display.Display()
+        self._root = self._display.screen().root
+        self._lock = threading.Lock()
+        self.grab_array()
+
+    def _grab(self, region):
+        if region:
+            left, top, right, bottom = region
+        else:
+            screen = self._display.screen()
+            left, top = 0, 0
+            right, bottom = screen.width_in_pixels, screen.height_in_pixels
+        size = (right - left, bottom - top)
+        # the connection is not thread-safe
+        with self._lock:
+            raw = self._root.get_image(
+                left, top, size[0], size[1], Xlib.X.ZPixmap, 0xFFFFFFFF
+            )
+        return size, raw.data
+
+    def grab(self, region=None):
+        size, data = self._grab(region)
+        return Image.frombuffer("RGB", size, data, "raw", "BGRX", 0, 1)
+
+    def grab_array(self, region=None):
+        (width, height), data = self._grab(region)
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)
+
+    def close(self):
+        self._display.close()
+
+
+class LegacyBackend(CaptureBackend):
+    """
+    The original capture path: pyautogui on Windows, a fresh Xlib connection and
+    `ImageGrab` on Linux, and `screencapture` on macOS, which also draws the cursor.
+    Used when no faster backend is available, or when one of them fails.
+    """
+
+    name = "legacy"
+
+    def grab(self, region=None):
+        user_platform = platform.system()
+
+        if user_platform == "Windows":
+            image = pyautogui.screenshot()
+        elif user_platform == "Linux":
+            # Use xlib to prevent scrot dependency for Linux
+            screen = Xlib.display.Display().screen()
+            size = screen.width_in_pixels, screen.height_in_pixels
+            image = ImageGrab.grab(bbox=(0, 0, size[0], size[1]))
+        elif user_platform == "Darwin":  # (Mac OS)
+            # Use the screencapture utility to capture the screen with the cursor
+            file_descriptor, file_path = tempfile.mkstemp(suffix=".png")
+            os.close(file_descriptor)
+            try:
+                subprocess.run(["screencapture", "-C", file_path])
+                with Image.open(file_path) as img:
+                    img.load()
+                    image = img.copy()
+            finally:
+                os.remove(file_path)
+        else:
+            print(
+                f"The platform you're using ({user_platform}) is not currently supported"
+            )
+            return None
+        return image.crop(region) if region else image
+
+
+_backend = None
+_backend_lock = threading.RLock()
+# Where screen settle samples come from when the capture backend is the legacy one
+_settle_backend = None
+
+
+def create_capture_backend(name="auto"):
+    """
+    Creates the capture backend called `name`. "auto" uses the fixture from
+    `config.frame_source` when set, then tries mss and a persistent Xlib
+    connection (except on macOS, where only the legacy path shows the cursor),
+    and falls back to the legacy implementation.
+    """
+    if config.frame_source:
+        return FixtureBackend(config.frame_source)
+    if name == "auto":
+        if platform.system() == "Darwin":
+            candidates = [LegacyBackend]
+        elif platform.system() == "Linux":
+            candidates = [MssBackend, XlibBackend, LegacyBackend]
+        else:
+            candidates = [MssBackend, LegacyBackend]
+    else:
+        candidates = [
+            {"mss": MssBackend, "xlib": XlibBackend, "legacy": LegacyBackend}[name],
+            LegacyBackend,
+        ]
+
+    for candidate in candidates:
+        try:
+            return candidate()
+        except Exception as e:
+            if config.verbose:
+                print(f"[create_capture_backend] {candidate.name} unavailable:", e)
+    return LegacyBackend()
+
+
+def init_capture_backend(name="auto"):
+    """
+    Picks the capture backend once at startup.
+    """
+    global _backend, _settle_backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+        if _settle_backend is not None:
+            _settle_backend.close()
+            _settle_backend = None
+        _backend = create_capture_backend(name)
+    if config.verbose:
+        print("[init_capture_backend] using", _backend.name)
+    return _backend
+
+
+def get_capture_backend():
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                init_capture_backend(config.capture_backend)
+    return _backend
+
+
+def get_settle_backend():
+    """
+    Returns the backend to take screen settle samples with. That is the capture
+    backend, except for the legacy one: on macOS a `screencapture` run and a
+    full PNG decode take longer than a settle poll, so samples, which don't
+    need the cursor, are taken with mss when it can capture.
+    """
+    global _settle_backend
+    backend = get_capture_backend()
+    if backend.name != "legacy":
+        return backend
+    with _backend_lock:
+        if _settle_backend is None:
+            try:
+                _settle_backend = MssBackend()
+            except Exception as e:
+                if config.verbose:
+                    print("[get_settle_backend] mss unavailable:", e)
+                _settle_backend = backend
+        return _settle_backend
+
+
+def fall_back_to_legacy(error):
+    """
+    Replaces a failing backend with the legacy implementation for the rest of the session.
+    """
+    global _backend, _settle_backend
+    with _backend_lock:
+        if _settle_backend is not None and _settle_backend.name != "legacy":
+            # the failure may come from the settle samples, stop taking them with mss
+            _settle_backend.close()
+            _settle_backend = LegacyBackend()
+        if _backend is not None and _backend.name in ("legacy", "fixture"):
+            return _backend
+        name = getattr(_backend, "name", "auto")
+        print(f"[capture] {name} capture failed ({error}), using legacy capture")
+        if _backend is not None:
+            _backend.close()
+        _backend = LegacyBackend()
+        return _backend
@@ -0,0 +1,157 @@
+import atexit
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+from operate.config import Config
+
+# Load configuration
+config = Config()
+
+# Base64 strings of the most recently sent images, most requests resend the same few
+BASE64_CACHE_SIZE = 8
+
+
+class ImageRef:
+    """
+    A lightweight, immutable handle to an encoded image in the frame store.
+    Messages hold these instead of base64 strings; copying a message copies
+    the handle, never the image. The image stays in the store while a handle
+    to it is alive.
+
+    Attributes:
+        key (str): SHA-1 of the encoded bytes.
+        media_type (str): e.g. "image/jpeg".
+        size (tuple): (width, height) in pixels.
+        byte_length (int): Length of the encoded image.
+    """
+
+    __slots__ = ("key", "media_type", "size", "byte_length", "__weakref__")
+
+    def __init__(self, key, media_type, size, byte_length):
+        self.key = key
+        self.media_type = media_type
+        self.size = size
+        self.byte_length = byte_length
+
+    @property
+    def base64_length(self):
+        return (self.byte_length + 2) // 3 * 4
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"<ImageRef {self.key[:12]} {self.media_type} {self.size[0]}x{self.size[1]} {self.byte_length} bytes>"
+
+
+class FrameStore:
+    """
+    Content-addressed storage for encoded images: storing the same bytes twice
+    returns the same `ImageRef`, so a session holds each frame once. Images
+    stay in memory up to `memory_limit` bytes, older ones spill to a temporary
+    directory, and an image is deleted once no `ImageRef` to it is left.
+    """
+
+    def __init__(self, memory_limit=64 * 1024 * 1024):
+        self.memory_limit = memory_limit
+        self._refs = weakref.WeakValueDictionary()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = {}
+        self._base64 = OrderedDict()
+        self._spill_dir = None
+        # re-entrant: a handle can be collected, and discarded, while the lock is held
+        self._lock = threading.RLock()
+
+    def put(self, data, media_type, size):
+        """
+        Stores encoded image bytes and returns their `ImageRef`.
+        """
+        key = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            ref = self._refs.get(key)
+            if ref is not None:
+                return ref
+            ref = ImageRef(key, media_type, tuple(size), len(data))
+            self._refs[key] = ref
+            weakref.finalize(ref, self._discard, key)
+            if key not in self._memory and key not in self._disk:
+                self._memory[key] = data
+                self._memory_bytes += len(data)
+                self._spill()
+        return ref
+
+    def get(self, ref):
+        """
+        Returns the encoded bytes of `ref`.
+        """
+        with self._lock:
+            data = self._memory.get(ref.key)
+            if data is not None:
+                self._memory.move_to_end(ref.key)
+                return data
+            file_path = self._disk[ref.key]
+        with open(file_path, "rb") as file:
+            return file.read()
+
+    def base64(self, ref):
+        """
+        Returns `ref` as a base64 string, encoded on first use and cached for a few requests.
+        """
+        with self._lock:
+            encoded = self._base64.get(ref.key)
+            if encoded is not None:
+                self._base64.move_to_end(ref.key)
+                return encoded
+        encoded = base64.b64encode(self.get(ref)).decode("utf-8")
+        with self._lock:
+            self._base64[ref.key] = encoded
+            while len(self._base64) > BASE64_CACHE_SIZE:
+                self._base64.popitem(last=False)
+        return encoded
+
+    def data_url(self, ref):
+        return f"data:{ref.media_type};base64,{self.base64(ref)}"
+
+    def _spill(self):
+        while self._memory_bytes > self.memory_limit and len(self._memory) > 1:
+            key, data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(data)
+            if self._spill_dir is None:
+                self._spill_dir = tempfile.mkdtemp(prefix="operate-frames-")
+                atexit.register(shutil.rmtree, self._spill_dir, True)
+            file_path = os.path.join(self._spill_dir, key)
+            with open(file_path, "wb") as file:
+                file.write(data)
+            self._disk[key] = file_path
+            if config.verbose:
+                print("[FrameStore] spilled", key[:12], "to disk")
+
+    def _discard(self, key):
+        with self._lock:
+            if key in self._refs:
+                # stored again since, under a new handle
+                return
+            data = self._memory.pop(key, None)
+            if data is not None:
+                self._memory_bytes -= len(data)
+            self._base64.pop(key, None)
+            file_path = self._disk.pop(key, None)
+        if file_path is not None:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+
+frame_store = FrameStore()
+
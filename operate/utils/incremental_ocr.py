@@ -0,0 +1,201 @@
+import threading
+
+import numpy as np
+
+from operate.config import Config
+from operate.utils.tracing import span
+
+# Load configuration
+config = Config()
+
+# The screen is compared in TILE_SIZE squares. Changed tiles are grown by
+# DIRTY_MARGIN pixels, and to cover every text box they touch, so words on the
+# edge of a change are read whole. Past FULL_PASS_FRACTION of the screen a
+# single full pass is cheaper than many crops.
+TILE_SIZE = 64
+DIRTY_MARGIN = 24
+FULL_PASS_FRACTION = 0.5
+
+
+def get_changed_tiles(previous, current, tile_size=TILE_SIZE):
+    """
+    Compares two frames of the same size tile by tile.
+
+    Returns:
+        numpy.ndarray: A (rows, columns) boolean grid, True where any pixel changed.
+    """
+    height, width = current.shape[:2]
+    changed = current != previous
+    if changed.ndim == 3:
+        changed = changed.any(axis=2)
+    rows, columns = -(-height // tile_size), -(-width // tile_size)
+    padded = np.zeros((rows * tile_size, columns * tile_size), dtype=bool)
+    padded[:height, :width] = changed
+    return padded.reshape(rows, tile_size, columns, tile_size).any(axis=(1, 3))
+
+
+def get_tile_regions(tiles, tile_size=TILE_SIZE):
+    """
+    Groups adjacent changed tiles (8-connected) and returns the bounding box of
+    each group as (left, top, right, bottom) in pixels.
+    """
+    regions = []
+    seen = np.zeros_like(tiles)
+    for row, column in zip(*np.nonzero(tiles)):
+        if seen[row, column]:
+            continue
+        seen[row, column] = True
+        stack = [(row, column)]
+        top, left, bottom, right = row, column, row, column
+        while stack:
+            r, c = stack.pop()
+            top, left = min(top, r), min(left, c)
+            bottom, right = max(bottom, r), max(right, c)
+            for nr in range(max(r - 1, 0), min(r + 2, tiles.shape[0])):
+                for nc in range(max(c - 1, 0), min(c + 2, tiles.shape[1])):
+                    if tiles[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        stack.append((nr, nc))
+        regions.append(
+            (
+                int(left * tile_size),
+                int(top * tile_size),
+                int((right + 1) * tile_size),
+                int((bottom + 1) * tile_size),
+            )
+        )
+    return regions
+
+
+def get_box_bounds(bbox):
+    """(left, top, right, bottom) of an EasyOCR bounding polygon."""
+    xs = [point[0] for point in bbox]
+    ys = [point[1] for point in bbox]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def intersects(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def expand_regions(regions, boxes, size, margin=DIRTY_MARGIN):
+    """
+    Grows the dirty regions by `margin` and over every text box they touch,
+    merging regions that end up overlapping, until nothing changes.
+    """
+    width, height = size
+
+    def grow(region, bounds):
+        return (
+            max(0, min(region[0], bounds[0] - margin)),
+            max(0, min(region[1], bounds[1] - margin)),
+            min(width, max(region[2], bounds[2] + margin)),
+            min(height, max(region[3], bounds[3] + margin)),
+        )
+
+    regions = [grow(region, region) for region in regions]
+    box_bounds = [get_box_bounds(box[0]) for box in boxes]
+    changed = True
+    while changed:
+        changed = False
+        for index, region in enumerate(regions):
+            for bounds in box_bounds:
+                if intersects(region, bounds):
+                    grown = grow(region, bounds)
+                    if grown != region:
+                        region = grown
+                        changed = True
+            regions[index] = region
+        merged = []
+        for region in regions:
+            for index, other in enumerate(merged):
+                if intersects(region, other):
+                    merged[index] = (
+                        min(region[0], other[0]),
+                        min(region[1], other[1]),
+                        max(region[2], other[2]),
+                        max(region[3], other[3]),
+                    )
+                    changed = True
+                    break
+            else:
+                merged.append(region)
+        regions = merged
+    return regions
+
+
+class IncrementalOCR:
+    """
+    Keeps the text boxes of the last OCR'd frame and, for the next frame, only
+    re-reads the tiles that changed. Boxes outside the changed area keep their
+    exact coordinates, and results have the same format as `readtext`.
+    """
+
+    def __init__(self, tile_size=TILE_SIZE, margin=DIRTY_MARGIN):
+        self.tile_size = tile_size
+        self.margin = margin
+        self._previous = None
+        self._boxes = []
+        self._lock = threading.Lock()
+
+    def read(self, frame, reader):
+        """
+        Returns the EasyOCR results for `frame`, reusing the boxes of unchanged areas.
+        """
+        with self._lock:
+            current = frame.array
+            previous = self._previous
+            if previous is None or previous.shape != current.shape:
+                return self._full_pass(current, reader)
+
+            tiles = get_changed_tiles(previous, current, self.tile_size)
+            if not tiles.any():
+                self._previous = current
+                return list(self._boxes)
+
+            regions = expand_regions(
+                get_tile_regions(tiles, self.tile_size),
+                self._boxes,
+                frame.size,
+                self.margin,
+            )
+            dirty_area = sum(
+                (right - left) * (bottom - top) for left, top, right, bottom in regions
+            )
+            if dirty_area > FULL_PASS_FRACTION * frame.size[0] * frame.size[1]:
+                return self._full_pass(current, reader)
+
+            boxes = [
+                box
+                for box in self._boxes
+                if not any(
+                    intersects(get_box_bounds(box[0]), region) for region in regions
+                )
+            ]
+            for left, top, right, bottom in regions:
+                with span("readtext", "ocr", region=(left, top, right, bottom)):
+                    results = reader.readtext(current[top:bottom, left:right])
+                for bbox, text, confidence in results:
+                    boxes.append(
+                        (
+                            [[int(x) + left, int(y) + top] for x, y in bbox],
+                            text,
+                            confidence,
+                        )
+                    )
+            if config.verbose:
+                print(
+                    f"[IncrementalOCR] re-read {len(regions)} region(s), "
+                    f"{dirty_area / (frame.size[0] * frame.size[1]):.1%} of the screen"
+                )
+            # keep reading order: top to bottom, then left to right
+            boxes.sort(key=lambda box: get_box_bounds(box[0])[1::-1])
+            self._previous = current
+            self._boxes = boxes
+            return list(boxes)
+
+    def _full_pass(self, current, reader):
+        with span("readtext", "ocr", region="full"):
+            self._boxes = list(reader.readtext(current))
+        self._previous = current
+        return list(self._boxes)
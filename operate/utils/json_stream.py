@@ -0,0 +1,88 @@
+import json
+
+
+class OperationStreamParser:
+    """
+    Parses a model reply while it streams in. The models answer with a JSON array
+    of operations, `[{"operation": "click", ...}, ...]`, sometimes inside a
+    ```json fence; every object of the top-level array is returned as soon as
+    its closing brace arrives. A reply that is a single object is returned as
+    one operation when it closes, if it has an "operation" key; any other
+    object before the array, e.g. an example in a prose preamble, is skipped.
+
+    Only complete objects are returned, and the parser never fails: whatever it
+    can't read is left to `json.loads` on the full reply.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.operations = []
+        self._position = 0
+        self._depth = 0
+        self._base = None
+        self._object_start = None
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk):
+        """
+        Adds the next chunk of the reply.
+
+        Returns:
+            list: The operations completed by this chunk.
+        """
+        self.text += chunk
+        completed = []
+        text = self.text
+        for position in range(self._position, len(text)):
+            character = text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif character == "\\":
+                    self._escaped = True
+                elif character == '"':
+                    self._in_string = False
+                continue
+
+            if self._base is None:
+                # skip anything before the JSON, e.g. the ```json fence
+                if character == "[":
+                    self._base = 1
+                elif character == "{":
+                    self._base = 0
+                else:
+                    continue
+
+            if character == '"':
+                self._in_string = True
+            elif character in "[{":
+                if character == "{" and self._depth == self._base:
+                    self._object_start = position
+                self._depth += 1
+            elif character in "]}":
+                self._depth -= 1
+                if (
+                    character == "}"
+                    and self._depth == self._base
+                    and self._object_start is not None
+                ):
+                    operation = self._load(text[self._object_start : position + 1])
+                    self._object_start = None
+                    if self._base == 0 and (
+                        operation is None or "operation" not in operation
+                    ):
+                        # not a bare operation, keep looking for the array
+                        self._base = None
+                    elif operation is not None:
+                        completed.append(operation)
+        self._position = len(text)
+        self.operations.extend(completed)
+        return completed
+
+    def _load(self, text):
+        try:
+            operation = json.loads(text)
+        except ValueError:
+            return None
+        return operation if isinstance(operation, dict) else None
@@ -1,10 +1,74 @@
-import io
-import base64
 import json
 import os
+import threading
 import time
 import asyncio
-from PIL import Image, ImageDraw
+import numpy as np
+import pkg_resources
+from PIL import ImageDraw
+from ultralytics import YOLO
+
+from operate.config import Config
+from operate.utils.artifacts import artifact_writer, should_save_artifacts
+from operate.utils.timing import measure
+from operate.utils.tracing import traced
+
+# Load configuration
+config = Config()
+
+# Process-wide YOLO detectors, keyed by weights path, so Set-of-Mark turns
+# don't reload and re-initialize the model every step.
+_yolo_models = {}
+_yolo_models_lock = threading.Lock()
+
+
+def get_yolo_model(file_path=None, fuse=True, warm_up=False):
+    """
+    Returns the shared YOLO model for the given weights, loading it on first use.
+
+    :param file_path: Path to the weights, defaults to the bundled `best.pt`.
+    :param fuse: Whether to fuse Conv and BatchNorm layers for faster inference.
+    :param warm_up: Whether to run a dummy frame through a freshly loaded model.
+    :return: The cached YOLO model.
+    """
+    if file_path is None:
+        file_path = pkg_resources.resource_filename("operate.models.weights", "best.pt")
+
+    yolo_model = _yolo_models.get(file_path)
+    if yolo_model is not None:
+        return yolo_model
+
+    with _yolo_models_lock:
+        yolo_model = _yolo_models.get(file_path)
+        if yolo_model is None:
+            if config.verbose:
+                print("[get_yolo_model] loading YOLO weights from", file_path)
+            yolo_model = YOLO(file_path)
+            if fuse:
+                yolo_model.fuse()
+            if warm_up:
+                # the first inference initializes the backend, pay for it now
+                yolo_model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+            _yolo_models[file_path] = yolo_model
+    return yolo_model
+
+
+def warm_up_yolo_model():
+    """
+    Loads and warms up the shared YOLO model in a background thread.
+
+    :return: The daemon thread doing the loading.
+    """
+
+    def load():
+        try:
+            get_yolo_model(warm_up=True)
+        except Exception as e:
+            print("[warm_up_yolo_model] error:", e)
+
+    thread = threading.Thread(target=load, name="yolo-warm-up", daemon=True)
+    thread.start()
+    return thread
 
 
 def validate_and_extract_image_data(data):
@@ -52,90 +116,140 @@ def is_overlapping(box1, box2):
     return True
 
 
-def add_labels(base64_data, yolo_model):
-    image_bytes = base64.b64decode(base64_data)
-    image_labeled = Image.open(io.BytesIO(image_bytes))  # Corrected this line
-    image_debug = image_labeled.copy()  # Create a copy for the debug image
-    image_original = (
-        image_labeled.copy()
-    )  # Copy of the original image for base64 return
+def filter_overlapping_boxes(boxes):
+    """
+    Greedily keeps boxes in order, dropping any box that overlaps an already kept one.
+    Same result as checking each box with `is_overlapping` against every drawn box,
+    but overlapping pairs are found with a sort-and-sweep over the x axis instead
+    of comparing every pair in Python.
+
+    :param boxes: Array-like of shape (n, 4) with (x1, y1, x2, y2) rows.
+    :return: Boolean numpy array of shape (n,), True for boxes to draw.
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    x1, y1, x2, y2 = boxes.T
+    count = len(boxes)
+
+    # Sweep: in x1 order, box `a` can only overlap the boxes after it whose left
+    # edge is not past its right edge, which is a contiguous run of the order.
+    order = np.argsort(x1, kind="stable")
+    run_starts = np.arange(1, count + 1)
+    run_ends = np.searchsorted(x1[order], x2[order], side="right")
+    run_lengths = np.maximum(run_ends - run_starts, 0)
+    first = np.repeat(np.arange(count), run_lengths)
+    offsets = np.arange(run_lengths.sum()) - np.repeat(
+        np.cumsum(run_lengths) - run_lengths, run_lengths
+    )
+    second = np.repeat(run_starts, run_lengths) + offsets
+    first, second = order[first], order[second]
+
+    # Those pairs overlap on x, keep the ones that also overlap on y
+    overlapping = ~((y1[first] > y2[second]) | (y1[second] > y2[first]))
+    first, second = first[overlapping], second[overlapping]
 
-    results = yolo_model(image_labeled)
+    # For every box, the later boxes it overlaps, grouped by the earlier index
+    earlier = np.minimum(first, second)
+    later = np.maximum(first, second)
+    grouping = np.argsort(earlier, kind="stable")
+    earlier, later = earlier[grouping], later[grouping]
+    bounds = np.searchsorted(earlier, np.arange(count + 1))
 
-    draw = ImageDraw.Draw(image_labeled)
-    debug_draw = ImageDraw.Draw(
-        image_debug
-    )  # Create a separate draw object for the debug image
-    font_size = 45
+    keep = np.zeros(count, dtype=bool)
+    suppressed = np.zeros(count, dtype=bool)
+    for index in range(count):
+        if suppressed[index]:
+            continue
+        keep[index] = True
+        suppressed[later[bounds[index] : bounds[index + 1]]] = True
 
-    labeled_images_dir = "labeled_images"
-    label_coordinates = {}  # Dictionary to store coordinates
+    return keep
 
-    if not os.path.exists(labeled_images_dir):
-        os.makedirs(labeled_images_dir)
-
-    counter = 0
-    drawn_boxes = []  # List to keep track of boxes already drawn
-    for result in results:
-        if hasattr(result, "boxes"):
-            for det in result.boxes:
-                bbox = det.xyxy[0]
-                x1, y1, x2, y2 = bbox.tolist()
-
-                debug_label = "D_" + str(counter)
-                debug_index_position = (x1, y1 - font_size)
-                debug_draw.rectangle([(x1, y1), (x2, y2)], outline="blue", width=1)
-                debug_draw.text(
-                    debug_index_position,
-                    debug_label,
-                    fill="blue",
-                    font_size=font_size,
-                )
-
-                overlap = any(
-                    is_overlapping((x1, y1, x2, y2), box) for box in drawn_boxes
-                )
-
-                if not overlap:
-                    draw.rectangle([(x1, y1), (x2, y2)], outline="red", width=1)
-                    label = "~" + str(counter)
-                    index_position = (x1, y1 - font_size)
-                    draw.text(
-                        index_position,
-                        label,
-                        fill="red",
-                        font_size=font_size,
-                    )
-
-                    # Add the non-overlapping box to the drawn_boxes list
-                    drawn_boxes.append((x1, y1, x2, y2))
-                    label_coordinates[label] = (x1, y1, x2, y2)
-
-                    counter += 1
-
-    # Save the image
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-
-    output_path = os.path.join(labeled_images_dir, f"img_{timestamp}_labeled.png")
-    output_path_debug = os.path.join(labeled_images_dir, f"img_{timestamp}_debug.png")
-    output_path_original = os.path.join(
-        labeled_images_dir, f"img_{timestamp}_original.png"
-    )
 
-    image_labeled.save(output_path)
-    image_debug.save(output_path_debug)
-    image_original.save(output_path_original)
+@traced("label")
+def add_labels(image, yolo_model):
+    """
+    Runs YOLO on the captured screen and draws a numbered label on every non-overlapping detection.
+    The labeled, debug and original images are written to `labeled_images/` in the background
+    when artifacts are being saved.
+
+    :param image: The captured screen as a PIL image, it is not modified.
+    :param yolo_model: The YOLO model used to detect UI elements.
+    :return: A tuple of the labeled PIL image and a dictionary of labels to box coordinates.
+    """
+    save_artifacts = should_save_artifacts()
+    image_labeled = image.copy()  # Draw labels on a copy of the captured frame
+    image_original = image  # The captured frame itself is never drawn on
+
+    with measure("label"):
+        results = yolo_model(image_labeled)
 
-    buffered_original = io.BytesIO()
-    image_original.save(buffered_original, format="PNG")  # I guess this is needed
-    img_base64_original = base64.b64encode(buffered_original.getvalue()).decode("utf-8")
+    draw = ImageDraw.Draw(image_labeled)
+    if save_artifacts:
+        image_debug = image.copy()  # Create a copy for the debug image
+        debug_draw = ImageDraw.Draw(
+            image_debug
+        )  # Create a separate draw object for the debug image
+    font_size = 45
 
-    # Convert image to base64 for return
-    buffered_labeled = io.BytesIO()
-    image_labeled.save(buffered_labeled, format="PNG")  # I guess this is needed
-    img_base64_labeled = base64.b64encode(buffered_labeled.getvalue()).decode("utf-8")
+    labeled_images_dir = "labeled_images"
+    label_coordinates = {}  # Dictionary to store coordinates
 
-    return img_base64_labeled, label_coordinates
+    # Gather every detection into one (n, 4) array and suppress overlaps in a single pass
+    boxes = [
+        result.boxes.xyxy.cpu().numpy().reshape(-1, 4)
+        for result in results
+        if hasattr(result, "boxes")
+    ]
+    boxes = np.concatenate(boxes) if boxes else np.empty((0, 4))
+    keep = filter_overlapping_boxes(boxes)
+    # the label counter only advances on drawn boxes, so a detection's debug
+    # index is the number of boxes kept before it
+    counters = np.cumsum(keep) - keep
+
+    for (x1, y1, x2, y2), kept, counter in zip(
+        boxes.tolist(), keep.tolist(), counters.tolist()
+    ):
+        if save_artifacts:
+            debug_label = "D_" + str(counter)
+            debug_index_position = (x1, y1 - font_size)
+            debug_draw.rectangle([(x1, y1), (x2, y2)], outline="blue", width=1)
+            debug_draw.text(
+                debug_index_position,
+                debug_label,
+                fill="blue",
+                font_size=font_size,
+            )
+
+        if kept:
+            draw.rectangle([(x1, y1), (x2, y2)], outline="red", width=1)
+            label = "~" + str(counter)
+            index_position = (x1, y1 - font_size)
+            draw.text(
+                index_position,
+                label,
+                fill="red",
+                font_size=font_size,
+            )
+
+            label_coordinates[label] = (x1, y1, x2, y2)
+
+    if save_artifacts:
+        # Hand the images to the background writer, they are not modified after this
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+
+        output_path = os.path.join(labeled_images_dir, f"img_{timestamp}_labeled.png")
+        output_path_debug = os.path.join(
+            labeled_images_dir, f"img_{timestamp}_debug.png"
+        )
+        output_path_original = os.path.join(
+            labeled_images_dir, f"img_{timestamp}_original.png"
+        )
+
+        artifact_writer.save(image_labeled, output_path)
+        artifact_writer.save(image_debug, output_path_debug)
+        artifact_writer.save(image_original, output_path_original)
+
+    return image_labeled, label_coordinates
 
 
 def get_click_position_in_percent(coordinates, image_size):
@@ -1,7 +1,18 @@
+import asyncio
+import functools
 import json
 import re
 
 
+async def run_blocking(func, *args, **kwargs):
+    """
+    Runs a blocking call (OCR, YOLO, screen capture, image encoding, sync SDKs)
+    in the default executor so the event loop stays free while it works.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
 def convert_percent_to_decimal(percent):
     try:
         # Remove the '%' sign and convert to float
@@ -1,19 +1,171 @@
 from operate.config import Config
-from PIL import Image, ImageDraw
+from operate.utils.timing import measure
+from operate.utils.incremental_ocr import IncrementalOCR
+from operate.utils.text_index import get_text_index
+from operate.utils.tracing import span
+from PIL import ImageDraw
+import asyncio
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import easyocr
+
 # Load configuration
 config = Config()
 
+# Process-wide EasyOCR readers, keyed by language list. Building a reader loads
+# the detector and recognizer weights, so it should happen once per process.
+_readers = {}
+_readers_lock = threading.Lock()
+
+# OCR passes keyed by the content hash of the screenshot they read, so every
+# click in a turn shares a single pass over the same frame. Passes run on a
+# single worker so speculative OCR can overlap with the model request.
+OCR_CACHE_SIZE = 4
+_ocr_results = OrderedDict()
+_ocr_results_lock = threading.Lock()
+_ocr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr")
+
+# Incremental OCR engines keyed by language list. They are only used from the
+# single OCR worker, so each one sees frames in the order they were submitted.
+_incremental_ocr = {}
+
+
+def get_ocr_reader(languages=("en",)):
+    """
+    Returns the shared EasyOCR reader for the given languages, creating it on first use.
+    Args:
+        languages (iterable): The language codes the reader should recognize.
+
+    Returns:
+        easyocr.Reader: The cached reader instance.
+    """
+    key = tuple(languages)
+    reader = _readers.get(key)
+    if reader is not None:
+        return reader
+
+    with _readers_lock:
+        # another thread may have finished loading while we waited on the lock
+        reader = _readers.get(key)
+        if reader is None:
+            if config.verbose:
+                print("[get_ocr_reader] loading EasyOCR reader for", list(key))
+            reader = easyocr.Reader(list(key))
+            _readers[key] = reader
+    return reader
+
+
+def warm_up_ocr_reader(languages=("en",)):
+    """
+    Loads the shared EasyOCR reader in a background thread so the first click doesn't pay for it.
+    Args:
+        languages (iterable): The language codes the reader should recognize.
 
-def get_text_element(result, search_text, image_path):
+    Returns:
+        threading.Thread: The daemon thread doing the loading.
     """
-    Searches for a text element in the OCR results and returns its index. Also draws bounding boxes on the image.
+
+    def load():
+        try:
+            get_ocr_reader(languages)
+        except Exception as e:
+            print("[warm_up_ocr_reader] error:", e)
+
+    thread = threading.Thread(target=load, name="ocr-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def submit_ocr(frame, languages=("en",)):
+    """
+    Schedules EasyOCR on a screenshot in the background, once per distinct image content.
+    Args:
+        frame (Frame): The captured screenshot.
+        languages (iterable): The language codes the reader should recognize.
+
+    Returns:
+        concurrent.futures.Future: Resolves to the list of results returned by EasyOCR.
+    """
+    key = (frame.digest, tuple(languages))
+    with _ocr_results_lock:
+        future = _ocr_results.get(key)
+        if future is not None:
+            _ocr_results.move_to_end(key)
+            if config.verbose:
+                print("[submit_ocr] reusing OCR pass for", key[0])
+            return future
+
+        future = _ocr_executor.submit(read_and_index_text, frame, languages)
+        _ocr_results[key] = future
+        while len(_ocr_results) > OCR_CACHE_SIZE:
+            _ocr_results.popitem(last=False)
+
+    def forget_failure(done):
+        # don't hand a failed pass to later lookups, let them retry instead
+        if done.exception() is not None:
+            with _ocr_results_lock:
+                if _ocr_results.get(key) is done:
+                    del _ocr_results[key]
+
+    future.add_done_callback(forget_failure)
+    return future
+
+
+def read_text(frame, languages=("en",)):
+    """
+    Runs EasyOCR over the frame, or over the parts that changed since the
+    previous frame with incremental OCR. Called on the OCR worker by `read_and_index_text`.
+    """
+    reader = get_ocr_reader(languages)
+    if config.incremental_ocr:
+        engine = _incremental_ocr.setdefault(tuple(languages), IncrementalOCR())
+        return engine.read(frame, reader)
+    with span("readtext", "ocr", size=frame.size):
+        return reader.readtext(frame.array)
+
+
+def read_and_index_text(frame, languages=("en",)):
+    """
+    Runs `read_text` and builds the text index of its result on the OCR worker,
+    so clicks on the frame only look the index up.
+    """
+    result = read_text(frame, languages)
+    with span("text_index", "ocr", boxes=len(result)):
+        get_text_index(result)
+    return result
+
+
+async def get_ocr_result_async(frame, languages=("en",)):
+    """
+    Returns the EasyOCR result for a screenshot, reusing an earlier or in-flight
+    pass over the same image. Hashing the frame and waiting on the pass happen
+    off the event loop.
+    Args:
+        frame (Frame): The captured screenshot.
+        languages (iterable): The language codes the reader should recognize.
+
+    Returns:
+        list: The list of results returned by EasyOCR.
+    """
+    loop = asyncio.get_running_loop()
+    # only the time spent waiting counts, speculative OCR may already be done
+    with measure("ocr"):
+        future = await loop.run_in_executor(None, submit_ocr, frame, tuple(languages))
+        return await asyncio.wrap_future(future)
+
+
+def get_text_element(result, search_text, frame):
+    """
+    Searches for a text element in the OCR results and returns the index of the
+    best match, ranked by a fuzzy text index. Also draws bounding boxes on the image.
     Args:
         result (list): The list of results returned by EasyOCR.
         search_text (str): The text to search for in the OCR results.
-        image_path (str): Path to the original image.
+        frame (Frame): The screenshot the OCR results were read from.
 
     Returns:
         int: The index of the element containing the search text.
@@ -29,26 +181,28 @@ def get_text_element(result, search_text, image_path):
         if not os.path.exists(ocr_dir):
             os.makedirs(ocr_dir)
 
-        # Open the original image
-        image = Image.open(image_path)
+        # Draw on a copy so the frame's pixels stay untouched
+        image = frame.image.copy()
         draw = ImageDraw.Draw(image)
 
-    found_index = None
-    for index, element in enumerate(result):
-        text = element[1]
-        box = element[0]
+    match = get_text_index(result).best(search_text)
+    found_index = match[0] if match else None
 
-        if config.verbose:
+    if config.verbose:
+        for element in result:
             # Draw bounding box in blue
-            draw.polygon([tuple(point) for point in box], outline="blue")
-
-        if search_text in text:
-            found_index = index
-            if config.verbose:
-                print("[get_text_element][loop] found search_text, index:", index)
+            draw.polygon([tuple(point) for point in element[0]], outline="blue")
 
     if found_index is not None:
         if config.verbose:
+            print(
+                "[get_text_element] found search_text, index:",
+                found_index,
+                "text:",
+                result[found_index][1],
+                "score:",
+                round(match[1], 3),
+            )
             # Draw bounding box of the found text in red
             box = result[found_index][0]
             draw.polygon([tuple(point) for point in box], outline="red")
@@ -63,13 +217,13 @@ def get_text_element(result, search_text, image_path):
     raise Exception("The text element was not found in the image")
 
 
-def get_text_coordinates(result, index, image_path):
+def get_text_coordinates(result, index, frame):
     """
     Gets the coordinates of the text element at the specified index as a percentage of screen width and height.
     Args:
         result (list): The list of results returned by EasyOCR.
         index (int): The index of the text element in the results list.
-        image_path (str): Path to the screenshot image.
+        frame (Frame): The screenshot the OCR results were read from.
 
     Returns:
         dict: A dictionary containing the 'x' and 'y' coordinates as percentages of the screen width and height.
@@ -90,8 +244,7 @@ def get_text_coordinates(result, index, image_path):
     center_y = (min_y + max_y) / 2
 
     # Get image dimensions
-    with Image.open(image_path) as img:
-        width, height = img.size
+    width, height = frame.size
 
     # Convert to percentages
     percent_x = round((center_x / width), 3)
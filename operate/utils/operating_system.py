@@ -3,28 +3,113 @@ import platform
 import time
 import math
 
+import pyperclip
+
+from operate.config import Config
 from operate.utils.misc import convert_percent_to_decimal
+from operate.utils.tracing import traced
+
+# Load configuration
+config = Config()
+
+# Default text entry per platform in "auto" mode. Pasting is much faster for
+# long strings, but on Linux it needs xclip/xsel and some terminals and X
+# apps ignore ctrl+v, so typing stays the default there.
+AUTO_WRITE_STRATEGIES = {"Darwin": "paste", "Windows": "paste", "Linux": "type"}
+
+# How long the target app gets to read the clipboard before it is restored
+PASTE_SETTLE_SECONDS = 0.1
+
+# How long each key combination is held down
+KEY_HOLD_SECONDS = 0.1
 
 
 class OperatingSystem:
+    def __init__(self):
+        self._screen_size = None
+
+    def get_screen_size(self):
+        """
+        Returns the screen size, queried once and reused for every click.
+        """
+        if self._screen_size is None:
+            self._screen_size = pyautogui.size()
+        return self._screen_size
+
+    @traced("actuation")
     def write(self, content):
         try:
             content = content.replace("\\n", "\n")
-            for char in content:
-                pyautogui.write(char)
+            if self.get_write_strategy(content) == "paste":
+                try:
+                    self.paste_text(content)
+                    return
+                except pyperclip.PyperclipException as e:
+                    # no clipboard mechanism (e.g. no xclip/xsel on Linux), type instead
+                    if config.verbose:
+                        print("[OperatingSystem][write] paste unavailable:", e)
+            self.type_text(content)
         except Exception as e:
             print("[OperatingSystem][write] error:", e)
 
+    def get_write_strategy(self, content):
+        """
+        Picks "type" or "paste" for `content`. In "auto" mode the platform default
+        from AUTO_WRITE_STRATEGIES is used, and short strings are always typed.
+        """
+        strategy = config.write_strategy
+        if strategy == "auto":
+            strategy = AUTO_WRITE_STRATEGIES.get(platform.system(), "type")
+            if strategy == "paste" and len(content) < config.paste_threshold:
+                strategy = "type"
+        return strategy
+
+    def type_text(self, content):
+        """
+        Types `content` in one pyautogui call, so the per-call pause is paid once
+        instead of once per character.
+        """
+        pyautogui.write(content, interval=config.write_interval)
+
+    def paste_text(self, content):
+        """
+        Enters `content` through the clipboard, pressing enter for each newline so
+        multi-line content submits the same way it would when typed. The previous
+        clipboard content is restored afterwards.
+        """
+        paste_key = "command" if platform.system() == "Darwin" else "ctrl"
+        previous_clipboard = pyperclip.paste()
+        try:
+            for index, line in enumerate(content.split("\n")):
+                if index:
+                    pyautogui.press("enter", _pause=False)
+                if line:
+                    pyperclip.copy(line)
+                    pyautogui.hotkey(paste_key, "v", _pause=False)
+                    time.sleep(PASTE_SETTLE_SECONDS)
+        finally:
+            pyperclip.copy(previous_clipboard)
+
     def press(self, keys):
+        self.press_sequence([keys])
+
+    @traced("actuation")
+    def press_sequence(self, key_combinations):
+        """
+        Presses each key combination in turn, e.g. `[["ctrl", "a"], ["delete"]]`.
+        Only the hold time is waited, not pyautogui's pause after every key event.
+        """
         try:
-            for key in keys:
-                pyautogui.keyDown(key)
-            time.sleep(0.1)
-            for key in keys:
-                pyautogui.keyUp(key)
+            for keys in key_combinations:
+                for key in keys:
+                    pyautogui.keyDown(key, _pause=False)
+                time.sleep(KEY_HOLD_SECONDS)
+                for key in keys:
+                    pyautogui.keyUp(key, _pause=False)
         except Exception as e:
             print("[OperatingSystem][press] error:", e)
 
+    @traced("actuation")
     def mouse(self, click_detail):
         try:
             x = convert_percent_to_decimal(click_detail.get("x"))
@@ -36,6 +121,7 @@ class OperatingSystem:
         except Exception as e:
             print("[OperatingSystem][mouse] error:", e)
 
+    @traced("actuation")
     def click_at_percentage(
         self,
         x_percentage,
@@ -45,10 +131,15 @@ class OperatingSystem:
         circle_duration=0.5,
     ):
         try:
-            screen_width, screen_height = pyautogui.size()
+            screen_width, screen_height = self.get_screen_size()
             x_pixel = int(screen_width * float(x_percentage))
             y_pixel = int(screen_height * float(y_percentage))
 
+            if not config.demo_mouse:
+                # warp and click right away, the animation below is only for show
+                pyautogui.click(x_pixel, y_pixel, _pause=False)
+                return
+
             pyautogui.moveTo(x_pixel, y_pixel, duration=duration)
 
             start_time = time.time()
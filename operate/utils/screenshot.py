@@ -1,42 +1,336 @@
+import hashlib
+import io
 import os
-import platform
-import subprocess
-import pyautogui
-from PIL import Image, ImageDraw, ImageGrab
-import Xlib.display
-import Xlib.X
-import Xlib.Xutil  # not sure if Xutil is necessary
+import time
+import numpy as np
+from PIL import Image, ImageDraw
 
+from operate.config import Config
+from operate.utils.capture import (
+    fall_back_to_legacy,
+    get_capture_backend,
+    get_settle_backend,
+)
+from operate.utils.frame_store import frame_store
+from operate.utils.timing import measure
+from operate.utils.tracing import traced
 
-def capture_screen_with_cursor(file_path):
-    user_platform = platform.system()
-
-    if user_platform == "Windows":
-        screenshot = pyautogui.screenshot()
-        screenshot.save(file_path)
-    elif user_platform == "Linux":
-        # Use xlib to prevent scrot dependency for Linux
-        screen = Xlib.display.Display().screen()
-        size = screen.width_in_pixels, screen.height_in_pixels
-        screenshot = ImageGrab.grab(bbox=(0, 0, size[0], size[1]))
-        screenshot.save(file_path)
-    elif user_platform == "Darwin":  # (Mac OS)
-        # Use the screencapture utility to capture the screen with the cursor
-        subprocess.run(["screencapture", "-C", file_path])
-    else:
-        print(f"The platform you're using ({user_platform}) is not currently supported")
-
-
-def compress_screenshot(raw_screenshot_filename, screenshot_filename):
-    with Image.open(raw_screenshot_filename) as img:
-        # Check if the image has an alpha channel (transparency)
-        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-            # Create a white background image
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            # Paste the image onto the background, using the alpha channel as mask
-            background.paste(img, mask=img.split()[3])  # 3 is the alpha channel
-            # Save the result as JPEG
-            background.save(screenshot_filename, 'JPEG', quality=85)  # Adjust quality as needed
+# Load configuration
+config = Config()
+
+MEDIA_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# How screenshots are encoded before upload, per provider. Edge limits follow
+# the resolution each provider actually uses, bigger images are only downscaled
+# on their side after paying for the upload. `max_bytes` is the request limit.
+UPLOAD_PROFILES = {
+    "openai": {
+        "max_long_edge": 2048,
+        "max_short_edge": 768,
+        "format": "JPEG",
+        "quality": 85,
+        "max_bytes": 20 * 1024 * 1024,
+    },
+    "anthropic": {
+        "max_long_edge": 1568,
+        "max_short_edge": 1568,
+        "format": "JPEG",
+        "quality": 85,
+        "max_bytes": 5 * 1024 * 1024,
+    },
+    "qwen": {
+        "max_long_edge": 1920,
+        "max_short_edge": 1080,
+        "format": "JPEG",
+        "quality": 85,
+        "max_bytes": 10 * 1024 * 1024,
+    },
+    "google": {
+        "max_long_edge": 3072,
+        "max_short_edge": 3072,
+        "format": "JPEG",
+        "quality": 85,
+        "max_bytes": 20 * 1024 * 1024,
+    },
+    "ollama": {
+        "max_long_edge": 1344,
+        "max_short_edge": 1344,
+        "format": "JPEG",
+        "quality": 85,
+        "max_bytes": 20 * 1024 * 1024,
+    },
+}
+MODEL_UPLOAD_PROFILES = {
+    "claude-3": "anthropic",
+    "qwen-vl": "qwen",
+    "gemini-pro-vision": "google",
+    "llava": "ollama",
+}
+UPLOAD_FALLBACK_QUALITIES = [70, 55, 40]
+UPLOAD_REDUCING_GAP = 2.0
+
+# Screen settle detection: after an action, poll small grayscale frames until
+# consecutive ones stop changing. A pixel counts as changed when it moves by
+# more than SETTLE_PIXEL_DELTA grey levels, and the screen counts as stable when
+# at most SETTLE_CHANGED_FRACTION of pixels changed for SETTLE_STABLE_POLLS polls
+# in a row, which tolerates a blinking text cursor.
+SETTLE_DOWNSCALE = 8
+SETTLE_POLL_INTERVAL = 0.05
+SETTLE_PIXEL_DELTA = 8
+SETTLE_CHANGED_FRACTION = 0.001
+SETTLE_STABLE_POLLS = 2
+
+
+
+class Frame:
+    """
+    A captured screen image whose encodings are computed lazily and memoized,
+    so one capture costs one decode and at most one encode per format.
+
+    Attributes:
+        image (PIL.Image.Image): The captured pixels.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self._encoded = {}
+        self._array = None
+        self._digest = None
+
+    @property
+    def size(self):
+        """(width, height) of the frame in screen pixels."""
+        return self.image.size
+
+    @property
+    def digest(self):
+        """Content hash of the raw pixels, used to key caches derived from this frame."""
+        if self._digest is None:
+            self._digest = hashlib.sha1(self.image.tobytes()).hexdigest()
+        return self._digest
+
+    @property
+    def array(self):
+        """The pixels as an RGB numpy array, as accepted by EasyOCR."""
+        if self._array is None:
+            self._array = np.asarray(self.image.convert("RGB"))
+        return self._array
+
+    def encode(self, format="PNG", **params):
+        """
+        Returns the frame encoded in the given format, e.g. `encode("JPEG", quality=85)`.
+        """
+        key = (format.upper(), tuple(sorted(params.items())))
+        if key not in self._encoded:
+            image = self.image
+            if key[0] == "JPEG" and image.mode != "RGB":
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, format=key[0], **params)
+            self._encoded[key] = buffer.getvalue()
+        return self._encoded[key]
+
+    def save(self, file_path):
+        """
+        Writes the frame to `file_path`, reusing an existing encoding where possible.
+        """
+        directory = os.path.dirname(file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        extension = os.path.splitext(file_path)[1].lower()
+        format = "JPEG" if extension in (".jpg", ".jpeg") else "PNG"
+        with open(file_path, "wb") as file:
+            file.write(self.encode(format))
+
+
+def get_upload_profile(model):
+    """
+    Returns the upload profile for `model`, with `config.image_format` and
+    `config.image_quality` applied on top when they are set.
+    """
+    profile = dict(
+        UPLOAD_PROFILES[MODEL_UPLOAD_PROFILES.get(model, "openai")]
+    )
+    if config.image_format:
+        profile["format"] = config.image_format.upper()
+    if config.image_quality:
+        profile["quality"] = config.image_quality
+    return profile
+
+
+def get_upload_size(size, profile):
+    """
+    Scales `size` down, keeping the aspect ratio, until it fits the profile's edge limits.
+    """
+    width, height = size
+    scale = min(
+        1.0,
+        profile["max_long_edge"] / max(width, height),
+        profile["max_short_edge"] / min(width, height),
+    )
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def prepare_upload_image(frame, model):
+    """
+    Returns the frame's image downscaled for `model`, for SDKs that take PIL images.
+    Coordinates are always computed on the original frame, never on this image.
+    """
+    profile = get_upload_profile(model)
+    size = get_upload_size(frame.size, profile)
+    if size == frame.size:
+        return frame.image
+    # BILINEAR with a reducing gap is much faster than LANCZOS and still sharp for UI text
+    return frame.image.resize(
+        size, Image.Resampling.BILINEAR, reducing_gap=UPLOAD_REDUCING_GAP
+    )
+
+
+@traced("encode")
+def get_upload_image(frame, model):
+    """
+    Encodes the frame the way `model` should receive it: scaled to the profile's
+    resolution, in the profile's codec, and under its byte budget. Lossy formats
+    first trade quality and then resolution until the image fits the budget.
+
+    Returns:
+        ImageRef: The encoded image in the frame store, to put in a message.
+    """
+    profile = get_upload_profile(model)
+    key = ("upload",) + tuple(sorted(profile.items()))
+    if key in frame._encoded:
+        return frame._encoded[key]
+    with measure("encode"):
+        image = frame_store.put(*encode_upload_image(frame, model, profile))
+    frame._encoded[key] = image
+    return image
+
+
+def encode_upload_image(frame, model, profile):
+    format = profile["format"]
+    image = prepare_upload_image(frame, model)
+    qualities = [profile["quality"]] + [
+        quality for quality in UPLOAD_FALLBACK_QUALITIES if quality < profile["quality"]
+    ]
+    while True:
+        upload = Frame(image)
+        for quality in (qualities if format != "PNG" else [None]):
+            params = {} if quality is None else {"quality": quality}
+            data = upload.encode(format, **params)
+            if len(data) <= profile["max_bytes"]:
+                break
+        if len(data) <= profile["max_bytes"] or min(image.size) <= 256:
+            break
+        if config.verbose:
+            print("[encode_upload_image] over byte budget, downscaling", image.size)
+        image = image.resize(
+            (round(image.width * 0.75), round(image.height * 0.75)),
+            Image.Resampling.BILINEAR,
+        )
+
+    if config.verbose:
+        print(
+            "[encode_upload_image]",
+            model,
+            frame.size,
+            "->",
+            image.size,
+            format,
+            len(data),
+            "bytes",
+        )
+    return data, MEDIA_TYPES[format], image.size
+
+
+def grab_screen(region=None):
+    """
+    Captures the screen, or the `(left, top, right, bottom)` region of it, as a
+    PIL image with the backend picked at startup.
+    """
+    backend = get_capture_backend()
+    try:
+        return backend.grab(region)
+    except Exception as e:
+        return fall_back_to_legacy(e).grab(region)
+
+
+def grab_settle_sample():
+    """
+    Returns a small grayscale sample of the screen, cheap enough to poll.
+    """
+    backend = get_settle_backend()
+    try:
+        pixels = backend.grab_array()
+    except Exception as e:
+        pixels = fall_back_to_legacy(e).grab_array()
+    # a strided view of the green channel, green sits at index 1 in RGB and BGRA alike
+    return pixels[::SETTLE_DOWNSCALE, ::SETTLE_DOWNSCALE, 1].astype(np.int16)
+
+
+@traced("settle")
+def wait_for_screen_settle(operation_type):
+    """
+    Waits until the screen stops changing after an operation, bounded by the
+    (minimum, maximum) seconds in `config.settle_timings[operation_type]`.
+
+    Returns:
+        float: The number of seconds spent waiting.
+    """
+    minimum, maximum = config.settle_timings.get(
+        operation_type, config.settle_timings["default"]
+    )
+    start = time.monotonic()
+    if maximum <= 0:
+        return 0.0
+    if minimum > 0:
+        time.sleep(minimum)
+
+    try:
+        previous = grab_settle_sample()
+    except Exception as e:
+        # can't look at the screen, fall back to the worst case wait
+        if config.verbose:
+            print("[wait_for_screen_settle] error:", e)
+        time.sleep(max(0.0, maximum - (time.monotonic() - start)))
+        return time.monotonic() - start
+
+    stable_polls = 0
+    while time.monotonic() - start < maximum:
+        time.sleep(SETTLE_POLL_INTERVAL)
+        sample = grab_settle_sample()
+        changed = np.count_nonzero(np.abs(sample - previous) > SETTLE_PIXEL_DELTA)
+        previous = sample
+        if sample.size and changed / sample.size <= SETTLE_CHANGED_FRACTION:
+            stable_polls += 1
+            if stable_polls >= SETTLE_STABLE_POLLS:
+                break
         else:
-            # If no alpha channel, simply convert and save
-            img.convert('RGB').save(screenshot_filename, 'JPEG', quality=85)
+            stable_polls = 0
+
+    waited = time.monotonic() - start
+    if config.verbose:
+        print(f"[wait_for_screen_settle] {operation_type} settled in {waited:.2f}s")
+    return waited
+
+
+@traced("capture")
+def capture_frame(file_path=None):
+    """
+    Captures the screen into a `Frame`. The frame is only written to `file_path`
+    when screenshots are being kept for debugging or evaluation.
+    """
+    with measure("capture"):
+        image = grab_screen()
+    if image is None:
+        return None
+    frame = Frame(image)
+    if file_path and (config.save_screenshots or config.verbose):
+        frame.save(file_path)
+    return frame
+
+
+@traced("capture")
+def capture_screen_with_cursor(file_path):
+    frame = capture_frame()
+    if frame is not None:
+        frame.save(file_path)
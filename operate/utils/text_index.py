@@ -0,0 +1,142 @@
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+# Matches scoring below this are treated as "not on screen"
+MIN_MATCH_SCORE = 0.5
+
+# Indexes of the most recent OCR results, so every click on a frame shares one index
+TEXT_INDEX_CACHE_SIZE = 4
+_text_indexes = OrderedDict()
+_text_indexes_lock = threading.Lock()
+
+
+def normalize_text(text):
+    """
+    Case-folds `text`, folds compatibility characters (e.g. full-width letters)
+    and turns punctuation into single spaces, so "Sign-In" matches "sign in".
+    """
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return " ".join(re.sub(r"[\W_]+", " ", text).split())
+
+
+def get_trigrams(text):
+    """
+    The character trigrams of normalized `text`, padded so short words and
+    word boundaries produce trigrams too.
+    """
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TextIndex:
+    """
+    A trigram inverted index over the texts of one OCR result, for ranked fuzzy
+    lookups of click targets.
+
+    Scores are in [0, 1]: 1.0 for an exact (normalized) match, about 0.9 when
+    the query appears as whole words inside a box, about 0.7 when a box holds
+    part of the query (OCR split the phrase), about 0.6 for a partial word, and
+    the trigram similarity, capped at 0.6, for misreads.
+    """
+
+    def __init__(self, result):
+        self.texts = [normalize_text(element[1]) for element in result]
+        trigram_counts = []
+        postings = {}
+        for index, text in enumerate(self.texts):
+            trigrams = get_trigrams(text) if text else set()
+            trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(index)
+        self._trigram_counts = np.array(trigram_counts, dtype=np.int32)
+        self._postings = {
+            trigram: np.array(indexes, dtype=np.int32)
+            for trigram, indexes in postings.items()
+        }
+
+    def search(self, query, limit=5, min_score=MIN_MATCH_SCORE):
+        """
+        Returns up to `limit` (index, score) pairs, best first. Ties go to the
+        earlier element, i.e. the one higher up the screen.
+        """
+        query = normalize_text(query)
+        if not query:
+            return []
+        query_trigrams = get_trigrams(query)
+        postings = [
+            self._postings[trigram]
+            for trigram in query_trigrams
+            if trigram in self._postings
+        ]
+        if not postings:
+            return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.texts))
+
+        # Only score elements that share enough trigrams to possibly pass: whole
+        # word and word prefix containment miss at most two boundary trigrams,
+        # and a Dice similarity of `min_score` needs min_score / 2 of both sets.
+        query_count = len(query_trigrams)
+        needed = np.minimum(
+            np.minimum(query_count, self._trigram_counts) - 2,
+            np.ceil(min_score / 2 * (query_count + self._trigram_counts)),
+        )
+        candidates = np.nonzero((shared > 0) & (shared >= needed))[0]
+
+        matches = []
+        for index in candidates.tolist():
+            score = self.score(query, query_count, index, int(shared[index]))
+            if score >= min_score:
+                matches.append((index, score))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit]
+
+    def score(self, query, query_trigram_count, index, common):
+        text = self.texts[index]
+        if text == query:
+            return 1.0
+        padded_text, padded_query = f" {text} ", f" {query} "
+        if padded_query in padded_text:
+            # prefer the tightest box around the query
+            return 0.9 + 0.09 * len(query) / len(text)
+        if padded_text in padded_query:
+            return 0.7 + 0.1 * len(text) / len(query)
+        if query in text or text in query:
+            # a partial word, e.g. "Sub" for "Submit"
+            shorter, longer = sorted((len(query), len(text)))
+            return 0.6 + 0.1 * shorter / longer
+        # Dice coefficient of the trigram sets, for misreads like "Subrnit"
+        return min(
+            0.6,
+            2 * common / (query_trigram_count + int(self._trigram_counts[index])),
+        )
+
+    def best(self, query, min_score=MIN_MATCH_SCORE):
+        """
+        Returns the (index, score) of the best match for `query`, or None.
+        """
+        matches = self.search(query, limit=1, min_score=min_score)
+        return matches[0] if matches else None
+
+
+def get_text_index(result):
+    """
+    Returns the index for an OCR result, building it if it isn't cached yet.
+    `submit_ocr` builds it on the OCR worker, right after the OCR pass.
+    """
+    key = id(result)
+    with _text_indexes_lock:
+        entry = _text_indexes.get(key)
+        # the result is kept alongside its index so its id can't be reused meanwhile
+        if entry is not None and entry[0] is result:
+            _text_indexes.move_to_end(key)
+            return entry[1]
+    index = TextIndex(result)
+    with _text_indexes_lock:
+        _text_indexes[key] = (result, index)
+        while len(_text_indexes) > TEXT_INDEX_CACHE_SIZE:
+            _text_indexes.popitem(last=False)
+    return index
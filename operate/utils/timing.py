@@ -0,0 +1,169 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+from operate.config import Config
+from operate.utils.tracing import span
+
+# Load configuration
+config = Config()
+
+# The turn currently being timed. Phases are recorded from executor threads too
+# (capture, OCR), so this is a plain module global rather than a context variable.
+_current_turn = None
+
+
+class TurnTimings:
+    """
+    Where the wall-clock time of one turn went: seconds per phase (capture,
+    encode, model, ocr, actuation, settle, ...) and one record per executed
+    operation with its start and end offsets from the start of the turn.
+
+    Phases can overlap, e.g. operations executing while a streamed reply is
+    still arriving, or speculative OCR during the model request. The time they
+    overlap is reported as `overlap`, so the phases plus `other`, minus
+    `overlap`, add up to `total`.
+
+    Attributes:
+        turn (int): The loop count of the turn.
+        started_at (float): Unix timestamp of the start of the turn.
+        phases (dict): Seconds spent per phase.
+        operations (list): One dict per executed operation.
+        metrics (dict): Other measurements of the turn, e.g. the request size.
+        total (float): Seconds from the start to the end of the turn, once finished.
+    """
+
+    def __init__(self, turn):
+        self.turn = turn
+        self.started_at = time.time()
+        self.phases = {}
+        self.operations = []
+        self.metrics = {}
+        self.total = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def offset(self, timestamp=None):
+        """
+        Returns `timestamp` (a `time.perf_counter()` value, now by default) relative to the start of the turn.
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        return timestamp - self._start
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_operation(self, operation, detail, start, end, actuation, settle, count=1):
+        """
+        Records one executed operation. `start` and `end` are `time.perf_counter()` values.
+        """
+        with self._lock:
+            self.operations.append(
+                {
+                    "operation": operation,
+                    "detail": detail,
+                    "start": round(self.offset(start), 4),
+                    "end": round(self.offset(end), 4),
+                    "actuation": round(actuation, 4),
+                    "settle": round(settle, 4),
+                    "coalesced": count,
+                }
+            )
+
+    def set_metric(self, name, value):
+        with self._lock:
+            self.metrics[name] = value
+
+    def add_metric(self, name, value):
+        with self._lock:
+            self.metrics[name] = self.metrics.get(name, 0) + value
+
+    def finish(self):
+        self.total = self.offset()
+        return self
+
+    def to_dict(self):
+        total = self.total if self.total is not None else self.offset()
+        phases = {phase: round(seconds, 4) for phase, seconds in self.phases.items()}
+        measured = sum(self.phases.values())
+        return {
+            "turn": self.turn,
+            "started_at": self.started_at,
+            "total": round(total, 4),
+            "phases": phases,
+            "other": round(max(0.0, total - measured), 4),
+            "overlap": round(max(0.0, measured - total), 4),
+            "operations": list(self.operations),
+            "metrics": dict(self.metrics),
+        }
+
+    def format_summary(self):
+        """
+        Returns a one-line breakdown such as `turn 0 4.21s: model 3.10s, ocr 0.52s, ...`,
+        ending with the time phases overlapped, if they did.
+        """
+        data = self.to_dict()
+        parts = [
+            f"{phase} {seconds:.2f}s"
+            for phase, seconds in sorted(
+                data["phases"].items(), key=lambda item: item[1], reverse=True
+            )
+        ]
+        parts.append(f"other {data['other']:.2f}s")
+        if data["overlap"]:
+            parts.append(f"overlapped {data['overlap']:.2f}s")
+        return f"turn {self.turn} {data['total']:.2f}s: " + ", ".join(parts)
+
+
+def start_turn(turn):
+    """
+    Starts timing a new turn. Phases measured from now on are recorded on it.
+    """
+    global _current_turn
+    _current_turn = TurnTimings(turn)
+    return _current_turn
+
+
+def current_turn():
+    return _current_turn
+
+
+@contextlib.contextmanager
+def measure(phase):
+    """
+    Adds the time spent in the `with` block to `phase` of the current turn,
+    and records it as a span when tracing. Does nothing beyond timing when no
+    turn is being timed.
+    """
+    start = time.perf_counter()
+    try:
+        with span(phase, "phase"):
+            yield
+    finally:
+        turn = _current_turn
+        if turn is not None:
+            turn.add(phase, time.perf_counter() - start)
+
+
+async def timed(phase, awaitable):
+    """
+    Awaits `awaitable` and adds the time it took to `phase` of the current turn,
+    e.g. `await timed("model", client.chat.completions.create(...))`.
+    """
+    with measure(phase):
+        return await awaitable
+
+
+def export_timings(turn_timings, file_path):
+    """
+    Appends the turn's breakdown to `file_path` as one JSON line.
+    """
+    directory = os.path.dirname(file_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(file_path, "a") as file:
+        file.write(json.dumps(turn_timings.to_dict()) + "\n")
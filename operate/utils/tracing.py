@@ -0,0 +1,181 @@
+import atexit
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+from operate.config import Config
+
+# Load configuration
+config = Config()
+
+
+class Tracer:
+    """
+    Records timed spans (capture, encoding, model calls, OCR, YOLO, actuation,
+    ...) for the whole session and exports them as a Chrome trace, which opens
+    in chrome://tracing or https://ui.perfetto.dev. Spans cost next to nothing
+    until the tracer is enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.file_path = None
+        self._events = []
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._exported = False
+
+    def enable(self, file_path):
+        """
+        Starts recording. The trace is written to `file_path` and a p50/p95
+        summary is printed when the process exits.
+        """
+        self.file_path = file_path
+        if not self.enabled:
+            self.enabled = True
+            atexit.register(self.export)
+
+    @contextlib.contextmanager
+    def span(self, name, category="operate", **args):
+        """
+        Records the `with` block as a span named `name`. `args` are shown with the span.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, time.perf_counter(), args)
+
+    def add(self, name, category, start, end, args=None):
+        """
+        Records a finished span. `start` and `end` are `time.perf_counter()` values.
+        """
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        with self._lock:
+            self._events.append(event)
+            self._threads[thread.ident] = thread.name
+
+    def summary(self):
+        """
+        Returns {span name: {"count", "total", "p50", "p95"}} with times in milliseconds.
+        """
+        durations = {}
+        with self._lock:
+            for event in self._events:
+                durations.setdefault(event["name"], []).append(event["dur"] / 1000)
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            summary[name] = {
+                "count": len(values),
+                "total": sum(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+            }
+        return summary
+
+    def export(self):
+        """
+        Writes the Chrome trace to `file_path` and prints the latency summary.
+        """
+        if not self.enabled or self._exported:
+            return
+        self._exported = True
+        summary = self.summary()
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": ident,
+                "args": {"name": name},
+            }
+            for ident, name in threads.items()
+        ]
+        directory = os.path.dirname(self.file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.file_path, "w") as file:
+            json.dump(
+                {
+                    "traceEvents": metadata + events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {"summary": summary},
+                },
+                file,
+            )
+
+        print(f"[Tracer] wrote {len(events)} spans to {self.file_path}")
+        print(f"{'span':<40} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'total ms':>10}")
+        for name, stats in sorted(
+            summary.items(), key=lambda item: item[1]["total"], reverse=True
+        ):
+            print(
+                f"{name:<40} {stats['count']:>6} {stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['total']:>10.1f}"
+            )
+
+
+def percentile(sorted_values, percent):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+tracer = Tracer()
+
+
+def span(name, category="operate", **args):
+    return tracer.span(name, category, **args)
+
+
+def traced(category):
+    """
+    Decorator recording every call of a function or coroutine function as a
+    span named after it, e.g. `@traced("capture")`.
+    """
+
+    def decorator(func):
+        name = func.__qualname__
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name, category):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator